@@ -0,0 +1,109 @@
+#!/usr/bin/python
+"""
+Load test of downloading the indicators from a local mock of the Helix API that
+serves the saved data in tests/fixtures/input, optionally repeated up to --size
+rows per indicator. Each response is delayed by --latency seconds and fails with
+probability --error-rate so that throughput, concurrency and retrying can be
+compared for numbers of download workers with no network. Results are written as
+JSON so that runs can be compared.
+
+Run with: python benchmarks/benchmark_download.py [--workers 1,4,8] [--latency 0.05] [--error-rate 0.05] [--size 100000] [--output results.json]
+
+"""
+
+import argparse
+import logging
+import platform
+from datetime import datetime, timezone
+from time import perf_counter
+
+from benchmark_pipeline import input_folder, setup_configuration
+
+from hdx.scraper.idmc.gidd.client import GIDDClient
+from hdx.scraper.idmc.gidd.mockapi import MockHelixAPI, get_endpoints
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+from hdx.utilities.saver import save_json
+
+
+def run(configuration, endpoints, workers, latency, error_rate):
+    with temp_dir(f"benchmark_download_{workers}") as folder:
+        with MockHelixAPI(
+            endpoints, latency=latency, error_rate=error_rate, seed=workers
+        ) as api:
+            mock_configuration = api.get_configuration(configuration)
+            # Waits between retries are kept short as the errors are injected
+            with GIDDClient(
+                retries=10, backoff_factor=0.01, pool_size=workers
+            ) as client:
+                retriever = Retrieve(client, folder, folder, folder, False, False)
+                pipeline = Pipeline(mock_configuration, retriever, folder, workers)
+                start = perf_counter()
+                pipeline.download_indicators()
+                elapsed = perf_counter() - start
+            stats = api.get_stats()
+        summary = client.stats.summary()
+        rows = sum(len(x["rows"]) for x in pipeline.indicator_data.values())
+        return {
+            "seconds": elapsed,
+            "rows": rows,
+            "rows_per_second": rows / elapsed,
+            "requests": summary["requests"],
+            "retries": summary["retries"],
+            "mean_latency": summary["mean_latency"],
+            "server_errors": stats["errors"],
+            "max_concurrent": stats["max_concurrent"],
+            "megabytes": stats["bytes"] / 1e6,
+        }
+
+
+def main(
+    workers=(1, 4, 8),
+    latency=0.05,
+    error_rate=0.05,
+    size=None,
+    output="benchmark_download.json",
+):
+    # Retries log a warning each
+    logging.disable(logging.WARNING)
+    configuration = setup_configuration()
+    endpoints = get_endpoints(configuration, input_folder, size)
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency": latency,
+        "error_rate": error_rate,
+        "size": size,
+        "workers": {},
+    }
+    for number in workers:
+        result = run(configuration, endpoints, number, latency, error_rate)
+        results["workers"][str(number)] = result
+        print(
+            f"{number} workers: {result['seconds']:.2f}s, "
+            f"{result['rows_per_second']:.0f} rows/s, "
+            f"{result['requests']} requests, {result['retries']} retries, "
+            f"max concurrent {result['max_concurrent']}"
+        )
+    save_json(results, output, pretty=True)
+    print(f"Results saved to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,4,8", help="Comma separated")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--size", type=int, help="Rows per indicator")
+    parser.add_argument("--output", default="benchmark_download.json")
+    args = parser.parse_args()
+    main(
+        [int(x) for x in args.workers.split(",")],
+        args.latency,
+        args.error_rate,
+        args.size,
+        args.output,
+    )
@@ -0,0 +1,88 @@
+#!/usr/bin/python
+"""
+Benchmark of the memory used to hold the saved indicator data. Compares the
+original layout of a list of row dictionaries plus lists of the same
+dictionaries by country with the columnar store used by Pipeline.
+
+Run with: python benchmarks/benchmark_memory.py
+
+"""
+
+import gc
+import tracemalloc
+from glob import glob
+from os.path import dirname, join
+
+from hdx.location.country import Country
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.dictandlist import dict_of_lists_add
+from hdx.utilities.downloader import Download
+from hdx.utilities.loader import load_json, load_yaml
+from hdx.utilities.path import script_dir_plus_file, temp_dir
+from hdx.utilities.retriever import Retrieve
+from hdx.utilities.useragent import UserAgent
+
+input_folder = join(dirname(dirname(__file__)), "tests", "fixtures", "input")
+
+
+def get_pages(name):
+    paths = glob(join(input_folder, f"{name}_*.json"))
+    paths = sorted(paths, key=lambda x: int(x.rsplit("_", 1)[1][:-5]))
+    for path in paths:
+        yield load_json(path)
+
+
+def build_original(indicator, pipeline):
+    rows = []
+    rows_by_country = {}
+    for json in get_pages(indicator["name"]):
+        for row in json["results"]:
+            countryiso = row["iso3"]
+            row["country_name"] = Country.get_country_name_from_iso3(countryiso)
+            for key in row:
+                if row[key] is None:
+                    row[key] = ""
+            rows.append(row)
+            dict_of_lists_add(rows_by_country, countryiso, row)
+    return {"rows": rows, "rows_by_country": rows_by_country}
+
+
+def build_columnar(indicator, pipeline):
+    return pipeline.download_data(indicator)
+
+
+def measure(build, indicators, pipeline):
+    gc.collect()
+    tracemalloc.start()
+    data = {x["name"]: build(x, pipeline) for x in indicators}
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return used
+
+
+def main():
+    UserAgent.set_global("benchmark")
+    Country.countriesdata(use_live=False)
+    configuration = load_yaml(
+        script_dir_plus_file("config/project_configuration.yaml", Pipeline)
+    )
+    indicators = configuration["indicators"]
+    results = {}
+    with temp_dir("benchmark_memory") as folder:
+        with Download() as downloader:
+            retriever = Retrieve(downloader, folder, input_folder, folder, False, True)
+            pipeline = Pipeline(configuration, retriever, folder)
+            for name, build in (
+                ("original", build_original),
+                ("columnar", build_columnar),
+            ):
+                results[name] = measure(build, indicators, pipeline)
+                print(f"{name}: {results[name] / 1024 / 1024:.1f} MB")
+    print(f"reduction: {results['original'] / results['columnar']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+"""
+Benchmark of row normalisation on the saved disaster pages. Compares rows per
+second of the original per row country name lookup and None replacement with
+Pipeline.normalise_rows.
+
+Run with: python benchmarks/benchmark_normalise.py
+
+"""
+
+from glob import glob
+from os.path import dirname, join
+from time import perf_counter
+
+from hdx.location.country import Country
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.loader import load_json
+
+input_folder = join(dirname(dirname(__file__)), "tests", "fixtures", "input")
+headers = [
+    "iso3",
+    "country_name",
+    "year",
+    "start_date",
+    "start_date_accuracy",
+    "end_date",
+    "end_date_accuracy",
+    "event_name",
+    "hazard_category",
+    "hazard_category_name",
+    "hazard_sub_category",
+    "hazard_sub_category_name",
+    "hazard_type",
+    "hazard_type_name",
+    "hazard_sub_type",
+    "hazard_subtype_name",
+    "new_displacement",
+    "new_displacement_rounded",
+    "total_displacement",
+    "total_displacement_rounded",
+    "event_codes",
+]
+
+
+def load_rows():
+    rows = []
+    for path in sorted(glob(join(input_folder, "disaster_*.json"))):
+        rows.extend(load_json(path)["results"])
+    return rows
+
+
+def normalise_rows_original(rows):
+    countries = set()
+    countrymapping = {}
+    for row in rows:
+        countryiso = row["iso3"]
+        countries.add(countryiso)
+        countrymapping[countryiso] = row["country_name"]
+        row["country_name"] = Country.get_country_name_from_iso3(countryiso)
+        for key in row:
+            if row[key] is None:
+                row[key] = ""
+        yield row
+
+
+def normalise_rows_pipeline(rows):
+    pipeline = Pipeline({}, None, "")
+    return pipeline.normalise_rows(rows, headers)
+
+
+def time_normalise(normalise_rows, repeats):
+    best = None
+    for _ in range(repeats):
+        rows = load_rows()
+        start = perf_counter()
+        for _ in normalise_rows(rows):
+            pass
+        elapsed = perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(rows), best
+
+
+def main(repeats=5):
+    Country.countriesdata(use_live=False)
+    results = {}
+    for name, normalise_rows in (
+        ("original", normalise_rows_original),
+        ("pipeline", normalise_rows_pipeline),
+    ):
+        no_rows, elapsed = time_normalise(normalise_rows, repeats)
+        results[name] = no_rows / elapsed
+        print(f"{name}: {no_rows} rows in {elapsed:.4f}s = {results[name]:,.0f} rows/s")
+    print(f"speedup: {results['pipeline'] / results['original']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
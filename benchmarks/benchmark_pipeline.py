@@ -0,0 +1,128 @@
+#!/usr/bin/python
+"""
+Benchmark of the pipeline replaying the saved data in tests/fixtures/input with
+no network. Times download_indicators, global dataset generation and generation
+of every country dataset at the original size and with synthetic inputs in which
+every saved page holds its rows repeated scale times. Results are written as JSON
+so that runs can be compared.
+
+Run with: python benchmarks/benchmark_pipeline.py [--scales 1,10,100] [--output results.json]
+
+"""
+
+import argparse
+import platform
+from datetime import datetime, timezone
+from os.path import dirname, join
+from time import perf_counter
+
+from hdx.api.configuration import Configuration
+from hdx.scraper.idmc.gidd.build import use_local_reference_data
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import script_dir_plus_file, temp_dir
+from hdx.utilities.retriever import Retrieve
+from hdx.utilities.saver import save_json
+from hdx.utilities.useragent import UserAgent
+
+input_folder = join(dirname(dirname(__file__)), "tests", "fixtures", "input")
+
+
+class ScaledRetriever:
+    """Retriever returning saved pages with each page's rows repeated scale times"""
+
+    def __init__(self, retriever, scale):
+        self.retriever = retriever
+        self.downloader = retriever.downloader
+        self.use_saved = True
+        self.scale = scale
+
+    def clone(self, downloader):
+        return ScaledRetriever(self.retriever.clone(downloader), self.scale)
+
+    def download_json(self, url, filename, **kwargs):
+        json = self.retriever.download_json(url, filename=filename, **kwargs)
+        if self.scale == 1:
+            return json
+        json["count"] *= self.scale
+        json["results"] = [
+            dict(row) for _ in range(self.scale) for row in json["results"]
+        ]
+        return json
+
+
+def setup_configuration():
+    UserAgent.set_global("benchmark")
+    Configuration._create(
+        hdx_read_only=True,
+        hdx_site="prod",
+        project_config_yaml=script_dir_plus_file(
+            join("config", "project_configuration.yaml"), Pipeline
+        ),
+    )
+    configuration = Configuration.read()
+    use_local_reference_data(configuration)
+    return configuration
+
+
+def run(configuration, scale):
+    with temp_dir(f"benchmark_pipeline_{scale}") as folder:
+        with Download() as downloader:
+            retriever = Retrieve(downloader, folder, input_folder, folder, False, True)
+            retriever = ScaledRetriever(retriever, scale)
+            pipeline = Pipeline(configuration, retriever, folder)
+            results = {}
+            start = perf_counter()
+            pipeline.download_indicators()
+            results["download_indicators"] = perf_counter() - start
+            countries = pipeline.get_countryiso3s()
+            # Showcase urls are treated as existing so no checks are made
+            pipeline.showcase_urls = {
+                pipeline.get_showcase_url(x["iso3"]): True for x in countries
+            }
+            start = perf_counter()
+            pipeline.generate_indicator_datasets_and_showcase()
+            results["generate_global"] = perf_counter() - start
+            start = perf_counter()
+            for country in countries:
+                pipeline.generate_country_dataset_and_showcase(country["iso3"])
+            results["generate_countries"] = perf_counter() - start
+            report = pipeline.instrumentation.get_report()
+            results["rows"] = report["counters"]["rows"]
+            results["countries"] = len(countries)
+            results["peak_memory_mb"] = report["peak_memory_mb"]
+            results["spans"] = {
+                name: span["total"] for name, span in report["spans"].items()
+            }
+    return results
+
+
+def main(scales=(1, 10, 100), output="benchmark_pipeline.json"):
+    configuration = setup_configuration()
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": {},
+    }
+    for scale in scales:
+        scale_results = run(configuration, scale)
+        results["scales"][str(scale)] = scale_results
+        print(
+            f"{scale}x: {scale_results['rows']} rows, "
+            f"download_indicators {scale_results['download_indicators']:.2f}s, "
+            f"generate_global {scale_results['generate_global']:.2f}s, "
+            f"generate_countries {scale_results['generate_countries']:.2f}s, "
+            f"peak memory {scale_results['peak_memory_mb']:.0f} MB"
+        )
+    save_json(results, output, pretty=True)
+    print(f"Results saved to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", default="1,10,100", help="Comma separated scales")
+    parser.add_argument("--output", default="benchmark_pipeline.json")
+    args = parser.parse_args()
+    main([int(x) for x in args.scales.split(",")], args.output)
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+"""
+Benchmark of generating every country dataset, including writing the global and
+country csvs, in one process and in pools of worker processes. Uses the saved
+data in tests/fixtures/input, optionally scaled up as in benchmark_pipeline.py.
+Speedups depend on the number of CPUs available.
+
+Run with: python benchmarks/benchmark_processes.py [--processes 1,2,4] [--scales 1,10]
+
+"""
+
+import argparse
+import logging
+from os import cpu_count
+from time import perf_counter
+
+from benchmark_pipeline import ScaledRetriever, input_folder, setup_configuration
+
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.scraper.idmc.gidd.processes import generate_country_datasets
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+def run(configuration, scale, processes):
+    with temp_dir(f"benchmark_processes_{scale}_{processes}") as folder:
+        with Download() as downloader:
+            retriever = Retrieve(downloader, folder, input_folder, folder, False, True)
+            retriever = ScaledRetriever(retriever, scale)
+            pipeline = Pipeline(configuration, retriever, folder)
+            pipeline.download_indicators()
+            countryiso3s = [x["iso3"] for x in pipeline.get_countryiso3s()]
+            # Showcase urls are treated as existing so no checks are made
+            pipeline.showcase_urls = {
+                pipeline.get_showcase_url(x): True for x in countryiso3s
+            }
+            start = perf_counter()
+            generate_country_datasets(pipeline, countryiso3s, processes)
+            # Any global csvs not yet written are included
+            for indicator in pipeline.get_indicators():
+                pipeline.get_filepaths(indicator)
+            return perf_counter() - start
+
+
+def main(processes=(1, 2, 4), scales=(1, 10)):
+    # Dataset creation logs a line per country and the countries without an
+    # HDX location log an error
+    logging.disable(logging.ERROR)
+    configuration = setup_configuration()
+    print(f"CPUs: {cpu_count()}")
+    for scale in scales:
+        timings = {x: run(configuration, scale, x) for x in processes}
+        baseline = timings[processes[0]]
+        for number, elapsed in timings.items():
+            print(
+                f"{scale}x, {number} processes: {elapsed:.2f}s "
+                f"({baseline / elapsed:.2f}x vs {processes[0]})"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", default="1,2,4", help="Comma separated")
+    parser.add_argument("--scales", default="1,10", help="Comma separated scales")
+    args = parser.parse_args()
+    main(
+        [int(x) for x in args.processes.split(",")],
+        [int(x) for x in args.scales.split(",")],
+    )
@@ -0,0 +1,105 @@
+#!/usr/bin/python
+"""
+Benchmark of the order in which country datasets are processed by a pool of
+workers. Every country dataset is generated once to time it, then a pool taking
+countries in order as workers become free is simulated with those timings for
+countries in alphabetical order and largest first (Pipeline.get_country_queue).
+Uses the saved data in tests/fixtures/input, optionally scaled up as in
+benchmark_pipeline.py.
+
+Run with: python benchmarks/benchmark_schedule.py [--workers 2,4,8] [--scales 1,10] [--output schedule.json]
+
+"""
+
+import argparse
+import heapq
+import logging
+from time import perf_counter
+
+from benchmark_pipeline import ScaledRetriever, input_folder, setup_configuration
+
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+from hdx.utilities.saver import save_json
+
+
+def get_makespan(timings, order, workers):
+    # Each country goes to the worker that becomes free first
+    free_at = [0.0] * workers
+    for countryiso in order:
+        heapq.heappush(free_at, heapq.heappop(free_at) + timings[countryiso])
+    return max(free_at)
+
+
+def run(configuration, scale, workers):
+    with temp_dir(f"benchmark_schedule_{scale}") as folder:
+        with Download() as downloader:
+            retriever = Retrieve(downloader, folder, input_folder, folder, False, True)
+            retriever = ScaledRetriever(retriever, scale)
+            pipeline = Pipeline(configuration, retriever, folder)
+            pipeline.download_indicators()
+            queue = pipeline.get_country_queue()
+            # Showcase urls are treated as existing so no checks are made
+            pipeline.showcase_urls = {
+                pipeline.get_showcase_url(x["iso3"]): True for x in queue
+            }
+            # The first country loads the HDX country data so is not timed
+            pipeline.generate_country_dataset_and_showcase(queue[-1]["iso3"])
+            timings = {}
+            for country in queue:
+                start = perf_counter()
+                pipeline.generate_country_dataset_and_showcase(country["iso3"])
+                timings[country["iso3"]] = perf_counter() - start
+    alphabetical = sorted(timings)
+    largest_first = [x["iso3"] for x in queue]
+    results = {
+        "countries": len(timings),
+        "total": sum(timings.values()),
+        "slowest": max(timings.values()),
+        "workers": {},
+    }
+    for number in workers:
+        results["workers"][number] = {
+            "alphabetical": get_makespan(timings, alphabetical, number),
+            "largest_first": get_makespan(timings, largest_first, number),
+        }
+    return results
+
+
+def main(workers=(2, 4, 8), scales=(1, 10), output=None):
+    # Dataset creation logs a line per country and the countries without an
+    # HDX location log an error
+    logging.disable(logging.ERROR)
+    configuration = setup_configuration()
+    results = {}
+    for scale in scales:
+        result = results[scale] = run(configuration, scale, workers)
+        print(
+            f"{scale}x: {result['countries']} countries, {result['total']:.2f}s in "
+            f"total, slowest {result['slowest']:.2f}s"
+        )
+        for number, makespans in result["workers"].items():
+            alphabetical = makespans["alphabetical"]
+            largest_first = makespans["largest_first"]
+            print(
+                f"{scale}x, {number} workers: alphabetical {alphabetical:.2f}s, "
+                f"largest first {largest_first:.2f}s "
+                f"({alphabetical / largest_first:.2f}x)"
+            )
+    if output:
+        save_json(results, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="2,4,8", help="Comma separated")
+    parser.add_argument("--scales", default="1,10", help="Comma separated scales")
+    parser.add_argument("--output", default=None, help="JSON file of results")
+    args = parser.parse_args()
+    main(
+        [int(x) for x in args.workers.split(",")],
+        [int(x) for x in args.scales.split(",")],
+        args.output,
+    )
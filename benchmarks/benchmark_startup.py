@@ -0,0 +1,142 @@
+#!/usr/bin/python
+"""
+Benchmark of the cold start of the scraper. Each case is run in a new interpreter
+with python -X importtime: importing the entry point, importing the pipeline and
+running the command line with --help. Records the wall time of the process, the
+total import time, the import time by package and the peak memory of the
+process. Results are written as JSON so that runs can be compared.
+
+Run with: python benchmarks/benchmark_startup.py [--repeat 5] [--top 10] [--output results.json]
+
+"""
+
+import argparse
+import platform
+import re
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from os import wait4
+from statistics import median
+from subprocess import DEVNULL, Popen
+from tempfile import TemporaryFile
+from time import perf_counter
+
+from hdx.utilities.saver import save_json
+
+cases = {
+    "import_main": ["-c", "import hdx.scraper.idmc.gidd.__main__"],
+    "import_pipeline": ["-c", "import hdx.scraper.idmc.gidd.pipeline"],
+    "cli_help": ["-m", "hdx.scraper.idmc.gidd", "--help"],
+}
+
+importtime_line = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def get_package(module):
+    # hdx is a namespace package so hdx.data, hdx.utilities etc. are kept apart
+    parts = module.split(".")
+    if parts[0] == "hdx" and len(parts) > 1:
+        if parts[1] == "scraper":
+            return "hdx.scraper.idmc.gidd"
+        return ".".join(parts[:2])
+    return parts[0]
+
+
+def parse_importtime(lines):
+    """Get the total import time and the import time of each package from the
+    output of -X importtime
+
+    Args:
+        lines (Iterable[str]): Lines written to stderr
+
+    Returns:
+        tuple[float, dict[str, float]]: Total seconds and seconds by package
+    """
+    total = 0
+    by_package = defaultdict(int)
+    for line in lines:
+        match = importtime_line.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, module = match.groups()
+        # Imports at the top level include those nested below them
+        if len(indent) == 1:
+            total += int(cumulative)
+        by_package[get_package(module)] += int(own)
+    return total / 1e6, {x: y / 1e6 for x, y in by_package.items()}
+
+
+def run(arguments):
+    with TemporaryFile("w+") as stderr:
+        start = perf_counter()
+        process = Popen(
+            [sys.executable, "-X", "importtime", *arguments],
+            stdout=DEVNULL,
+            stderr=stderr,
+        )
+        # wait4 gives the resource usage of this process alone
+        _, status, usage = wait4(process.pid, 0)
+        elapsed = perf_counter() - start
+        process.returncode = status
+        stderr.seek(0)
+        lines = stderr.read().splitlines()
+    if status:
+        errors = [x for x in lines if not x.startswith("import time:")]
+        raise RuntimeError(f"{' '.join(arguments)} failed: {errors[-1:]}")
+    import_seconds, by_package = parse_importtime(lines)
+    return {
+        "wall_seconds": elapsed,
+        "import_seconds": import_seconds,
+        # ru_maxrss is in KB on Linux
+        "peak_memory_mb": usage.ru_maxrss / 1024,
+        "by_package": by_package,
+    }
+
+
+def summarise(runs, top):
+    by_package = defaultdict(list)
+    for result in runs:
+        for package, seconds in result["by_package"].items():
+            by_package[package].append(seconds)
+    by_package = {x: median(y) for x, y in by_package.items()}
+    slowest = sorted(by_package.items(), key=lambda x: x[1], reverse=True)[:top]
+    return {
+        "wall_seconds": median(x["wall_seconds"] for x in runs),
+        "import_seconds": median(x["import_seconds"] for x in runs),
+        "peak_memory_mb": median(x["peak_memory_mb"] for x in runs),
+        "slowest_packages": dict(slowest),
+    }
+
+
+def main(repeat=5, top=10, output="benchmark_startup.json"):
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": {},
+    }
+    for name, arguments in cases.items():
+        # The first run warms the bytecode cache and is not counted
+        run(arguments)
+        result = summarise([run(arguments) for _ in range(repeat)], top)
+        results["cases"][name] = result
+        print(
+            f"{name}: wall {result['wall_seconds']:.2f}s, "
+            f"imports {result['import_seconds']:.2f}s, "
+            f"peak memory {result['peak_memory_mb']:.0f} MB"
+        )
+        for package, seconds in result["slowest_packages"].items():
+            print(f"    {package}: {seconds:.3f}s")
+    save_json(results, output, pretty=True)
+    print(f"Results saved to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each case")
+    parser.add_argument("--top", type=int, default=10, help="Packages to show")
+    parser.add_argument("--output", default="benchmark_startup.json")
+    args = parser.parse_args()
+    main(args.repeat, args.top, args.output)
@@ -0,0 +1,94 @@
+#!/usr/bin/python
+"""
+Benchmark of the total time to write the global and all country csvs of every
+indicator from the saved data. Compares one save_iterable call per resource, as
+Dataset.generate_resource did, with a single pass of write_csvs per indicator.
+
+Run with: python benchmarks/benchmark_write.py
+
+"""
+
+from os.path import dirname, join
+from time import perf_counter
+
+from hdx.location.country import Country
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.scraper.idmc.gidd.writer import write_csvs
+from hdx.utilities.downloader import Download
+from hdx.utilities.loader import load_yaml
+from hdx.utilities.path import script_dir_plus_file, temp_dir
+from hdx.utilities.retriever import Retrieve
+from hdx.utilities.saver import save_iterable
+from hdx.utilities.useragent import UserAgent
+
+input_folder = join(dirname(dirname(__file__)), "tests", "fixtures", "input")
+
+
+def flatten_rows(rows, headers, flatten):
+    indices = [headers.index(header) for header in flatten]
+    for row in rows:
+        for index in indices:
+            row[index] = ",".join(row[index])
+        yield row
+
+
+def write_per_resource(pipeline, folder):
+    for indicator in pipeline.get_indicators():
+        name = indicator["title"]
+        headers = indicator["headers"]
+        filepath = join(folder, f"{name}.csv")
+        save_iterable(filepath, pipeline.get_rows(indicator), headers)
+        data = pipeline.indicator_data[indicator["name"]]
+        for countryiso in data["rows_by_country"]:
+            filepath = join(folder, f"{name}_{countryiso}.csv")
+            rows = pipeline.get_rows(indicator, countryiso)
+            rows = flatten_rows(rows, headers, indicator["flatten"])
+            save_iterable(filepath, rows, headers)
+
+
+def write_bulk(pipeline, folder):
+    for indicator in pipeline.get_indicators():
+        write_csvs(
+            folder,
+            indicator["title"],
+            indicator["headers"],
+            pipeline.get_rows(indicator),
+            indicator["flatten"],
+        )
+
+
+def time_write(write, pipeline, folder, repeats):
+    best = None
+    for _ in range(repeats):
+        start = perf_counter()
+        write(pipeline, folder)
+        elapsed = perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(repeats=3):
+    UserAgent.set_global("benchmark")
+    Country.countriesdata(use_live=False)
+    configuration = load_yaml(
+        script_dir_plus_file("config/project_configuration.yaml", Pipeline)
+    )
+    results = {}
+    with temp_dir("benchmark_write") as folder:
+        with Download() as downloader:
+            retriever = Retrieve(downloader, folder, input_folder, folder, False, True)
+            pipeline = Pipeline(configuration, retriever, folder)
+            pipeline.download_indicators()
+            for name, write in (
+                ("per_resource", write_per_resource),
+                ("bulk", write_bulk),
+            ):
+                results[name] = time_write(write, pipeline, folder, repeats)
+                print(f"{name}: {results[name]:.3f}s")
+    print(f"speedup: {results['per_resource'] / results['bulk']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,123 +1,322 @@
 #!/usr/bin/python
 """
 Top level script. Calls other functions that generate datasets that this script then creates in HDX.
+The HDX and pipeline modules are imported when main runs so that importing this
+module or asking for --help stays cheap.
 
 """
 
 import logging
-from os import getenv
+import sys
+from os import getenv, makedirs
 from os.path import expanduser, join
 
-from hdx.api.configuration import Configuration
-from hdx.data.user import User
-from hdx.facades.infer_arguments import facade
 from hdx.scraper.idmc.gidd._version import __version__
-from hdx.scraper.idmc.gidd.pipeline import Pipeline
-from hdx.utilities.downloader import Download
-from hdx.utilities.path import (
-    progress_storing_folder,
-    script_dir_plus_file,
-    wheretostart_tempdir_batch,
-)
-from hdx.utilities.retriever import Retrieve
+from hdx.scraper.idmc.gidd.instrumentation import profile
 
 logger = logging.getLogger(__name__)
 
 lookup = "hdx-scraper-idmc-gidd"
 
 
-def main(save: bool = False, use_saved: bool = False) -> None:
+def main(
+    save: bool = False,
+    use_saved: bool = False,
+    download_workers: int = 1,
+    streaming: bool = False,
+    snapshots: bool = False,
+    response_cache: bool = False,
+    incremental: bool = False,
+    workers: int = 1,
+    processes: int = 1,
+    skip_unchanged_uploads: bool = False,
+    aggregates: bool = False,
+    build_only: bool = False,
+    output_folder: str = "build",
+) -> None:
     """Generate datasets and create them in HDX
 
     Args:
         save (bool): Save downloaded data. Defaults to False.
         use_saved (bool): Use saved data. Defaults to False.
+        download_workers (int): Number of pages to download at once. Defaults to 1.
+        streaming (bool): Store rows on disk instead of in memory. Defaults to False.
+        snapshots (bool): Save and reuse normalised data (needs pyarrow). Defaults to False.
+        response_cache (bool): Cache API pages between runs. Defaults to False.
+        incremental (bool): Only update what changed since last run. Defaults to False.
+        workers (int): Number of country datasets to create at once. Defaults to 1.
+        processes (int): Number of processes to generate country datasets. Defaults to 1.
+        skip_unchanged_uploads (bool): Don't reupload unchanged files. Defaults to False.
+        aggregates (bool): Publish aggregates of indicators. Defaults to False.
+        build_only (bool): Write files to output_folder without using HDX. Defaults to False.
+        output_folder (str): Folder for build_only output. Defaults to build.
 
     Returns:
         None
     """
+    from hdx.api.configuration import Configuration
+    from hdx.data.user import User
+    from hdx.scraper.idmc.gidd.build import build, use_local_reference_data
+    from hdx.scraper.idmc.gidd.cache import CachingRetriever, ResponseCache
+    from hdx.scraper.idmc.gidd.client import GIDDClient
+    from hdx.scraper.idmc.gidd.manifest import Manifest
+    from hdx.scraper.idmc.gidd.parallel import (
+        get_remaining,
+        progress_storing_pool,
+        resumable_order,
+    )
+    from hdx.scraper.idmc.gidd.pipeline import Pipeline
+    from hdx.scraper.idmc.gidd.processes import generate_country_datasets
+    from hdx.scraper.idmc.gidd.publish import (
+        count_hdx_calls,
+        publish_dataset,
+        publish_showcase,
+        sort_resources,
+    )
+    from hdx.scraper.idmc.gidd.snapshot import Snapshots
+    from hdx.scraper.idmc.gidd.uploads import UploadManifest
+    from hdx.scraper.idmc.gidd.urlchecker import URLChecker
+    from hdx.utilities.path import (
+        progress_storing_folder,
+        script_dir_plus_file,
+        wheretostart_tempdir_batch,
+    )
+    from hdx.utilities.retriever import Retrieve
+    from hdx.utilities.saver import save_json
 
     logger.info(f"##### {lookup} version {__version__} ####")
     configuration = Configuration.read()
-    User.check_current_user_write_access(
-        "647d9d8c-4cac-4c33-b639-649aad1c2893", configuration=configuration
+    hdx_calls = count_hdx_calls(configuration)
+    # State is kept in one folder so that it carries over between runs started
+    # from any folder
+    state_folder = expanduser(
+        getenv("GIDD_STATE_FOLDER", configuration["state_folder"])
     )
+    makedirs(state_folder, exist_ok=True)
+    if build_only:
+        use_local_reference_data(configuration)
+        incremental = False
+        skip_unchanged_uploads = False
+    else:
+        User.check_current_user_write_access(
+            "647d9d8c-4cac-4c33-b639-649aad1c2893", configuration=configuration
+        )
     with wheretostart_tempdir_batch(lookup) as info:
-        folder = info["folder"]
+        # Checkpoints and row stores are kept out of the output folder of a
+        # build so that they are not taken as build output or reused by the next
+        # build
+        scratch_folder = info["folder"]
+        if build_only:
+            folder = output_folder
+            makedirs(folder, exist_ok=True)
+        else:
+            folder = scratch_folder
         idmc_key = getenv("IDMC_KEY")
         if idmc_key:
             extra_params_dict = {"client_id": idmc_key}
         else:
             extra_params_dict = None
-        with Download(
+        with GIDDClient(
             extra_params_dict=extra_params_dict,
             extra_params_yaml=join(expanduser("~"), ".extraparams.yaml"),
             extra_params_lookup=lookup,
+            **configuration["api_client"],
         ) as downloader:
             retriever = Retrieve(
-                downloader, folder, "saved_data", folder, save, use_saved
+                downloader,
+                scratch_folder,
+                "saved_data",
+                scratch_folder,
+                save,
+                use_saved,
             )
-            folder = info["folder"]
+            if response_cache and not use_saved:
+                cache_configuration = configuration["response_cache"]
+                cache = ResponseCache(
+                    join(state_folder, cache_configuration["folder"]),
+                    cache_configuration["max_mb"] * 1024 * 1024,
+                    cache_configuration["ttl"],
+                )
+                retriever = CachingRetriever(retriever, cache)
             batch = info["batch"]
-            pipeline = Pipeline(configuration, retriever, folder)
-            pipeline.download_indicators()
-            countries = pipeline.get_countryiso3s()
-            indicators = pipeline.get_indicators()
-            datasets, showcase = pipeline.generate_indicator_datasets_and_showcase()
-
-            logger.info(f"Number of indicator datasets to upload: {len(indicators)}")
-            logger.info(f"Number of country datasets to upload: {len(countries)}")
-
-            showcase_not_added = True
-            for nextdict in indicators:
-                if showcase_not_added:
-                    showcase.create_in_hdx()
-                    showcase_not_added = False
-                dataset = datasets[nextdict["name"]]
-                dataset.update_from_yaml(
-                    script_dir_plus_file(
+            if incremental:
+                manifest = Manifest(join(state_folder, configuration["manifest"]))
+            else:
+                manifest = None
+            if skip_unchanged_uploads:
+                uploads = UploadManifest(
+                    join(state_folder, configuration["upload_manifest"])
+                )
+            else:
+                uploads = None
+            snapshot_store = None
+            if snapshots:
+                try:
+                    snapshot_store = Snapshots(
+                        join(state_folder, configuration["snapshot_folder"])
+                    )
+                except ImportError:
+                    logger.warning("pyarrow is not installed so not using snapshots!")
+            with Pipeline(
+                configuration,
+                retriever,
+                folder,
+                download_workers,
+                streaming,
+                manifest,
+                uploads,
+                checkpoint=not use_saved,
+                snapshots=snapshot_store,
+                scratch_folder=scratch_folder,
+                aggregates=aggregates,
+            ) as pipeline:
+                instrumentation = pipeline.instrumentation
+                if build_only:
+                    urlchecker = URLChecker(
+                        join(state_folder, configuration["showcase_url_cache"]),
+                        configuration["showcase_url_ttl"],
+                        configuration["showcase_url_workers"],
+                        downloader.session.headers,
+                        missing_ttl=configuration["showcase_url_missing_ttl"],
+                    )
+                    static_yaml = script_dir_plus_file(
                         join("config", "hdx_dataset_static.yaml"), main
                     )
+                    summary = build(pipeline, urlchecker, static_yaml, processes)
+                    logger.info(
+                        f"Built {len(summary['datasets'])} global and {len(summary['countries'])} country datasets in {folder}"
+                    )
+                    return
+                pipeline.download_indicators()
+                logger.info(f"Helix API requests: {downloader.stats.summary()}")
+                if response_cache and not use_saved:
+                    logger.info(f"Response cache: {cache.get_stats()}")
+                # Largest countries first so that they do not finish last, in the
+                # same order as any run being resumed
+                countries = resumable_order(info, pipeline.get_country_queue(), "iso3")
+                indicators = pipeline.get_updated_indicators()
+                urlchecker = URLChecker(
+                    join(state_folder, configuration["showcase_url_cache"]),
+                    configuration["showcase_url_ttl"],
+                    configuration["showcase_url_workers"],
+                    downloader.session.headers,
+                    missing_ttl=configuration["showcase_url_missing_ttl"],
                 )
-                dataset.create_in_hdx(
-                    remove_additional_resources=True,
-                    updated_by_script="HDX Scraper: IDMC",
-                    batch=batch,
+                with instrumentation.span("check_showcase_urls"):
+                    pipeline.check_showcase_urls(urlchecker)
+                if processes > 1:
+                    # Generated before the global datasets so that the country csvs
+                    # are written by the worker processes. Countries done by the
+                    # run being resumed are not generated again.
+                    remaining = get_remaining(info, countries, "iso3")
+                    generated = generate_country_datasets(
+                        pipeline, [x["iso3"] for x in remaining], processes
+                    )
+                else:
+                    generated = {}
+                with instrumentation.span("generate_global"):
+                    datasets, showcase = (
+                        pipeline.generate_indicator_datasets_and_showcase()
+                    )
+
+                logger.info(
+                    f"Number of indicator datasets to upload: {len(indicators)}"
                 )
-                showcase.add_dataset(dataset)
-
-            for _, nextdict in progress_storing_folder(info, countries, "iso3"):
-                countryiso = nextdict["iso3"]
-                (
-                    dataset,
-                    showcase,
-                ) = pipeline.generate_country_dataset_and_showcase(
-                    countryiso,
+                logger.info(f"Number of country datasets to upload: {len(countries)}")
+
+                static_yaml = script_dir_plus_file(
+                    join("config", "hdx_dataset_static.yaml"), main
                 )
-                if dataset:
-                    dataset.update_from_yaml(
-                        script_dir_plus_file(
-                            join("config", "hdx_dataset_static.yaml"), main
+                published = []
+                for nextdict in indicators:
+                    dataset = datasets[nextdict["name"]]
+                    if not pipeline.has_uploads(dataset):
+                        logger.info(f"{dataset['name']} has no files to upload")
+                    with instrumentation.span("upload_global", nextdict["name"]):
+                        publish_dataset(
+                            dataset, static_yaml, "HDX Scraper: IDMC", batch, uploads
                         )
+                    published.append(dataset)
+                if published:
+                    with instrumentation.span("upload_showcase"):
+                        publish_showcase(showcase, published)
+
+                def create_country_dataset(nextdict):
+                    countryiso = nextdict["iso3"]
+                    if countryiso in generated:
+                        dataset, showcase = generated[countryiso]
+                    else:
+                        with instrumentation.span("generate_country", countryiso):
+                            (
+                                dataset,
+                                showcase,
+                            ) = pipeline.generate_country_dataset_and_showcase(
+                                countryiso,
+                            )
+                    if dataset:
+                        sort_resources(dataset)
+                        if not pipeline.has_uploads(dataset):
+                            logger.info(f"{dataset['name']} has no files to upload")
+                        with instrumentation.span("upload_country", countryiso):
+                            publish_dataset(
+                                dataset,
+                                static_yaml,
+                                "HDX Scraper: IDMC GIDD",
+                                batch,
+                                uploads,
+                            )
+
+                if workers > 1:
+                    failures = progress_storing_pool(
+                        info, countries, "iso3", create_country_dataset, workers
                     )
-                    dataset.create_in_hdx(
-                        remove_additional_resources=True,
-                        updated_by_script="HDX Scraper: IDMC GIDD",
-                        batch=batch,
-                    )
-                    resources = dataset.get_resources()
-                    resource_ids = [
-                        x["id"] for x in sorted(resources, key=lambda x: len(x["name"]))
-                    ]
-                    dataset.reorder_resources(resource_ids)
+                    if failures:
+                        failed = ", ".join(sorted(failures))
+                        raise RuntimeError(
+                            f"{len(failures)} country datasets failed: {failed}. Rerun to resume."
+                        )
+                else:
+                    for _, nextdict in progress_storing_folder(info, countries, "iso3"):
+                        create_country_dataset(nextdict)
+                if manifest:
+                    manifest.save()
+                if uploads:
+                    uploads.save()
+                report = instrumentation.get_report()
+                report["api"] = downloader.stats.summary()
+                report["hdx"] = hdx_calls.summary()
+                country_times = instrumentation.get_item_times(
+                    "generate_country", "upload_country"
+                )
+                report["countries"] = {
+                    x["iso3"]: {"rows": x["rows"], **country_times.get(x["iso3"], {})}
+                    for x in countries
+                }
+                logger.info(f"HDX API calls: {report['hdx']}")
+                save_json(
+                    report,
+                    join(state_folder, configuration["run_report"]),
+                    pretty=True,
+                )
+                peak_memory = report["peak_memory_mb"]
+                if peak_memory is not None:
+                    logger.info(f"Peak memory usage: {peak_memory:.0f} MB")
 
 
 if __name__ == "__main__":
-    facade(
-        main,
-        user_agent_config_yaml=join(expanduser("~"), ".useragents.yaml"),
-        user_agent_lookup=lookup,
-        project_config_yaml=script_dir_plus_file(
-            join("config", "project_configuration.yaml"), main
-        ),
-    )
+    from hdx.facades.infer_arguments import facade
+    from hdx.utilities.path import script_dir_plus_file
+
+    # A build makes no changes in HDX so it is run read only and needs no HDX key
+    if "--build-only" in sys.argv and "--hdx-read-only" not in sys.argv:
+        sys.argv.append("--hdx-read-only")
+    # Set GIDD_PROFILE to cprofile or pyinstrument to profile the run
+    with profile():
+        facade(
+            main,
+            user_agent_config_yaml=join(expanduser("~"), ".useragents.yaml"),
+            user_agent_lookup=lookup,
+            project_config_yaml=script_dir_plus_file(
+                join("config", "project_configuration.yaml"), main
+            ),
+        )
@@ -0,0 +1,161 @@
+"""
+Aggregate:
+----------
+
+Aggregates of the rows of an indicator such as totals per country and year. If
+pyarrow is installed, they are computed by grouping a pyarrow Table. Otherwise,
+rows are grouped by sorting their keys and each group is totalled in Python.
+
+"""
+
+from itertools import groupby
+from operator import itemgetter
+
+from hdx.scraper.idmc.gidd.writer import get_filepath, write_csv
+
+
+def get_regions(iso3s):
+    from hdx.location.country import Country
+
+    # Looked up once per country rather than once per row
+    regions = {}
+    for countryiso in set(iso3s):
+        countryinfo = Country.get_country_info_from_iso3(countryiso)
+        if countryinfo:
+            regions[countryiso] = countryinfo["Region Name"] or ""
+        else:
+            regions[countryiso] = ""
+    return list(map(regions.__getitem__, iso3s))
+
+
+# Columns that can be grouped by which are derived from another column
+derived_columns = {"region": ("iso3", get_regions)}
+
+
+def get_source_headers(aggregates):
+    """Get the headers of the indicator needed to compute aggregates
+
+    Args:
+        aggregates (list[dict]): Aggregate configurations
+
+    Returns:
+        list[str]: Headers
+    """
+    headers = {"iso3"}
+    for aggregate in aggregates:
+        headers.update(aggregate["group_by"])
+        headers.update(aggregate.get("sum", ()))
+    headers = {derived_columns.get(x, (x,))[0] for x in headers}
+    return sorted(headers)
+
+
+def add_derived_columns(columns, aggregates):
+    for aggregate in aggregates:
+        for header in aggregate["group_by"]:
+            if header in derived_columns and header not in columns:
+                source, function = derived_columns[header]
+                columns[header] = function(columns[source])
+
+
+def get_headers(group_by, sums, count):
+    headers = list(group_by) + list(sums)
+    if count:
+        headers.append(count)
+    return headers
+
+
+def aggregate_rows_arrow(pa, columns, group_by, sums, count):
+    # Empty values are nulls which sum ignores and whose sum is null if all the
+    # values in a group are null
+    arrays = {header: pa.array(columns[header]) for header in group_by}
+    for header in sums:
+        values = [None if x == "" else x for x in columns[header]]
+        arrays[f"_{header}"] = pa.array(values, type=pa.int64())
+    aggregations = [(f"_{header}", "sum") for header in sums]
+    if count:
+        aggregations.append(([], "count_all"))
+    table = pa.table(arrays).group_by(list(group_by), use_threads=False)
+    table = table.aggregate(aggregations)
+    table = table.sort_by([(header, "ascending") for header in group_by])
+    output_columns = [table[header].to_pylist() for header in group_by]
+    for header in sums:
+        values = table[f"_{header}_sum"].to_pylist()
+        output_columns.append(["" if x is None else x for x in values])
+    if count:
+        output_columns.append(table["count_all"].to_pylist())
+    return get_headers(group_by, sums, count), [list(x) for x in zip(*output_columns)]
+
+
+def aggregate_rows_python(columns, group_by, sums, count):
+    keys = list(zip(*(columns[header] for header in group_by)))
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    sum_columns = [columns[header] for header in sums]
+    rows = []
+    for key, indices in groupby(order, key=keys.__getitem__):
+        indices = list(indices)
+        row = list(key)
+        for column in sum_columns:
+            values = list(map(column.__getitem__, indices))
+            total = sum(filter(None, values))
+            if not total and values.count("") + values.count(None) == len(values):
+                total = ""
+            row.append(total)
+        if count:
+            row.append(len(indices))
+        rows.append(row)
+    return get_headers(group_by, sums, count), rows
+
+
+def aggregate_rows(columns, group_by, sums=(), count=None):
+    """Group rows by the values of group_by and total the values of sums in each
+    group. Empty values are ignored unless all the values in a group are empty in
+    which case the total is empty.
+
+    Args:
+        columns (dict[str, Sequence]): Values by header
+        group_by (Sequence[str]): Headers to group by
+        sums (Sequence[str]): Headers of integer columns to total. Defaults to ().
+        count (str | None): Header of number of rows in group. Defaults to None.
+
+    Returns:
+        tuple[list[str], list[list]]: Headers and rows sorted by group
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        return aggregate_rows_python(columns, group_by, sums, count)
+    return aggregate_rows_arrow(pyarrow, columns, group_by, sums, count)
+
+
+def write_aggregates(folder, aggregates, columns):
+    """Compute aggregates and write a global csv of each plus, unless countries
+    is false, a csv per country of the aggregate with iso3 added to group_by
+
+    Args:
+        folder (str): Folder to which to write files
+        aggregates (list[dict]): Aggregate configurations
+        columns (dict[str, Sequence]): Values by header from get_source_headers
+
+    Returns:
+        dict[str, dict[str | None, str]]: Paths by country (None for global) by aggregate name
+    """
+    add_derived_columns(columns, aggregates)
+    filepaths = {}
+    for aggregate in aggregates:
+        title = aggregate["title"]
+        group_by = aggregate["group_by"]
+        sums = aggregate.get("sum", ())
+        count = aggregate.get("count")
+        headers, rows = aggregate_rows(columns, group_by, sums, count)
+        paths = {None: write_csv(get_filepath(folder, title), headers, rows)}
+        if aggregate.get("countries", True):
+            if "iso3" not in group_by:
+                group_by = ["iso3", *group_by]
+                headers, rows = aggregate_rows(columns, group_by, sums, count)
+            get_countryiso = itemgetter(group_by.index("iso3"))
+            rows.sort(key=get_countryiso)
+            for countryiso, countryrows in groupby(rows, key=get_countryiso):
+                filepath = get_filepath(folder, title, countryiso)
+                paths[countryiso] = write_csv(filepath, headers, countryrows)
+        filepaths[aggregate["name"]] = paths
+    return filepaths
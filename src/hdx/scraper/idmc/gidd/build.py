@@ -0,0 +1,123 @@
+"""
+Build:
+------
+
+Builds every csv along with the metadata of every dataset and showcase into a
+folder without calling HDX. Country datasets can be generated in worker
+processes.
+
+"""
+
+import logging
+from os import makedirs
+from os.path import basename, join
+
+from hdx.api.locations import Locations
+from hdx.data.resource import Resource
+from hdx.data.vocabulary import Vocabulary
+from hdx.location.country import Country
+from hdx.scraper.idmc.gidd.processes import generate_country_datasets
+from hdx.utilities.saver import save_json
+
+logger = logging.getLogger(__name__)
+
+
+def use_local_reference_data(configuration):
+    """Use locations from the country data, tags from the configuration and csv as
+    the only format so that generating datasets does not read them from HDX.
+
+    Args:
+        configuration (Configuration): HDX configuration
+
+    Returns:
+        None
+    """
+    countriesdata = Country.countriesdata(use_live=False)
+    locations = [{"name": "world", "title": "World"}]
+    for countryiso, country in countriesdata["countries"].items():
+        locations.append(
+            {"name": countryiso.lower(), "title": country["Preferred Term"]}
+        )
+    Locations.set_validlocations(locations)
+    Resource.set_formatsdict({"csv": "csv"})
+    tags = set(configuration["tags"])
+    for indicator in configuration["indicators"]:
+        tags.update(indicator["tags"])
+    Vocabulary.set_tagsdict({tag: {"Action to Take": "ok"} for tag in tags})
+    # Vocabulary has no setter for the approved vocabulary, which it otherwise
+    # reads from HDX
+    Vocabulary._approved_vocabulary = {
+        "tags": [{"name": tag} for tag in sorted(tags)],
+        # Id of the approved vocabulary in HDX
+        "id": "4e61d464-4943-4e97-973a-84673c1aaa87",
+        "name": "approved",
+    }
+
+
+def save_dataset(dataset, folder, static_yaml):
+    # Returns a description of the dataset: where its metadata is and the csv of
+    # each resource
+    dataset.update_from_yaml(static_yaml)
+    path = join("datasets", f"{dataset['name']}.json")
+    dataset.save_to_json(join(folder, path))
+    files = {
+        x["name"]: basename(x.get_file_to_upload()) for x in dataset.get_resources()
+    }
+    return {"name": dataset["name"], "metadata": path, "files": files}
+
+
+def save_showcase(showcase, folder):
+    path = join("showcases", f"{showcase['name']}.json")
+    save_json(showcase.data, join(folder, path), pretty=True)
+    return {"name": showcase["name"], "metadata": path}
+
+
+def build_country(countryiso, dataset, showcase, folder, static_yaml):
+    descriptor = {"iso3": countryiso, "dataset": None, "showcase": None}
+    if dataset:
+        descriptor["dataset"] = save_dataset(dataset, folder, static_yaml)
+    if showcase:
+        descriptor["showcase"] = save_showcase(showcase, folder)
+    return descriptor
+
+
+def build(pipeline, urlchecker, static_yaml, workers=1):
+    """Download the data and build all csvs plus dataset and showcase metadata
+    into the pipeline's folder. A summary is saved to build.json.
+
+    Args:
+        pipeline (Pipeline): Pipeline whose folder is the output folder
+        urlchecker (URLChecker): Checker of country showcase urls
+        static_yaml (str): Path to static dataset metadata
+        workers (int): Number of processes to generate country datasets. Defaults to 1.
+
+    Returns:
+        dict: Summary of what was built
+    """
+    folder = pipeline.folder
+    for subfolder in ("datasets", "showcases"):
+        makedirs(join(folder, subfolder), exist_ok=True)
+    instrumentation = pipeline.instrumentation
+    pipeline.download_indicators()
+    with instrumentation.span("check_showcase_urls"):
+        pipeline.check_showcase_urls(urlchecker)
+    # Countries are generated first so that their csvs are written by the
+    # worker processes
+    countryiso3s = [x["iso3"] for x in pipeline.get_countryiso3s()]
+    with instrumentation.span("build_countries"):
+        generated = generate_country_datasets(pipeline, countryiso3s, workers)
+        countries = [
+            build_country(x, *generated[x], folder, static_yaml) for x in countryiso3s
+        ]
+    with instrumentation.span("generate_global"):
+        datasets, showcase = pipeline.generate_indicator_datasets_and_showcase()
+    global_datasets = [save_dataset(x, folder, static_yaml) for x in datasets.values()]
+    summary = {
+        "datasets": global_datasets,
+        "showcase": save_showcase(showcase, folder),
+        "countries": countries,
+        "failed": [x["iso3"] for x in countries if x["dataset"] is None],
+        "report": instrumentation.get_report(),
+    }
+    save_json(summary, join(folder, "build.json"), pretty=True)
+    return summary
@@ -0,0 +1,222 @@
+"""
+Cache:
+------
+
+Disk cache of API pages keyed by url without client_id. Each entry records the
+ETag and Last-Modified of the response and when it expires. Entries that have
+not expired are used without a request. Expired entries are revalidated with a
+conditional request so that only pages that changed are downloaded again. The
+least recently used entries are evicted when the cache is larger than its
+maximum size.
+
+"""
+
+import hashlib
+import logging
+import re
+from os import makedirs, remove, replace
+from os.path import exists, getsize, join
+from threading import Lock
+from time import time
+
+from hdx.utilities.loader import load_json
+from hdx.utilities.saver import save_json
+from hdx.utilities.url import get_url_for_get, get_url_params_for_post
+
+logger = logging.getLogger(__name__)
+
+max_age_pattern = re.compile(r"max-age=(\d+)")
+
+
+class ResponseCache:
+    def __init__(self, folder, max_bytes=None, ttl=0):
+        """Cache of pages in folder. Pages expire after the max-age of the
+        response's Cache-Control header or ttl seconds if it has none.
+
+        Args:
+            folder (str): Folder of cache
+            max_bytes (int | None): Maximum size of pages. Defaults to None (no limit).
+            ttl (float): Seconds before pages expire. Defaults to 0 (always revalidate).
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        makedirs(folder, exist_ok=True)
+        self.index_path = join(folder, "index.json")
+        if exists(self.index_path):
+            self.index = load_json(self.index_path)
+        else:
+            self.index = {}
+        self.lock = Lock()
+        self.stats = {"hits": 0, "not_modified": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def get_key(url):
+        # client_id is left out and parameters are sorted so that the same page
+        # has the same key whoever requests it
+        url, params = get_url_params_for_post(url)
+        params.pop("client_id", None)
+        return get_url_for_get(url, dict(sorted(params.items())))
+
+    def get_path(self, key):
+        filename = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return join(self.folder, f"{filename}.json")
+
+    def get_expires(self, headers):
+        match = max_age_pattern.search(headers.get("Cache-Control", ""))
+        if match:
+            return time() + int(match.group(1))
+        return time() + self.ttl
+
+    def save_index(self):
+        save_json(self.index, self.index_path)
+
+    def get_entry(self, key):
+        with self.lock:
+            entry = self.index.get(key)
+        if entry and not exists(self.get_path(key)):
+            return None
+        return entry
+
+    @staticmethod
+    def is_fresh(entry):
+        return time() < entry["expires"]
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, key, headers=None):
+        """Load a cached page, marking it as used and, if headers of a 304
+        response are given, as revalidated
+
+        Args:
+            key (str): Key from get_key
+            headers (Mapping[str, str] | None): Headers of 304 response. Defaults to None.
+
+        Returns:
+            Any: Page or None if it has been evicted
+        """
+        # Another download worker can evict the page at any time
+        try:
+            json = load_json(self.get_path(key))
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            entry = self.index.pop(key, None)
+            if entry is None:
+                return None
+            # The index is kept in order of use, least recent first
+            self.index[key] = entry
+            if headers is None:
+                self.stats["hits"] += 1
+            else:
+                self.stats["not_modified"] += 1
+                entry["expires"] = self.get_expires(headers)
+            self.save_index()
+        return json
+
+    def store(self, key, json, headers):
+        """Store a downloaded page and evict the least recently used pages if
+        the cache is too large
+
+        Args:
+            key (str): Key from get_key
+            json (Any): Page
+            headers (Mapping[str, str]): Headers of response
+
+        Returns:
+            None
+        """
+        path = self.get_path(key)
+        temp_path = f"{path}.tmp"
+        save_json(json, temp_path)
+        replace(temp_path, path)
+        with self.lock:
+            self.stats["misses"] += 1
+            self.index.pop(key, None)
+            self.index[key] = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "expires": self.get_expires(headers),
+                "size": getsize(path),
+            }
+            self.evict()
+            self.save_index()
+
+    def evict(self):
+        # Called with the lock held
+        if not self.max_bytes:
+            return
+        size = sum(x["size"] for x in self.index.values())
+        for key in list(self.index):
+            if size <= self.max_bytes:
+                break
+            size -= self.index.pop(key)["size"]
+            path = self.get_path(key)
+            if exists(path):
+                remove(path)
+            self.stats["evictions"] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.index)
+            stats["bytes"] = sum(x["size"] for x in self.index.values())
+            return stats
+
+
+class CachingRetriever:
+    """Retriever that uses a ResponseCache in front of a Retrieve. It needs a
+    GIDDClient as downloader to make conditional requests. Saved data is used
+    without the cache."""
+
+    def __init__(self, retriever, cache):
+        self.retriever = retriever
+        self.downloader = retriever.downloader
+        self.cache = cache
+
+    def clone(self, downloader):
+        # Clones for download workers share the cache
+        return CachingRetriever(self.retriever.clone(downloader), self.cache)
+
+    def save(self, json, filename):
+        # Pages from the cache are saved as Retrieve saves downloaded pages
+        if self.retriever.save:
+            save_json(json, join(self.retriever.saved_dir, filename))
+
+    def download_json(self, url, filename=None, **kwargs):
+        if self.retriever.use_saved:
+            return self.retriever.download_json(url, filename=filename, **kwargs)
+        cache = self.cache
+        key = cache.get_key(url)
+        entry = cache.get_entry(key)
+        if entry:
+            if cache.is_fresh(entry):
+                json = cache.load(key)
+                if json is not None:
+                    self.save(json, filename)
+                    return json
+                # Evicted by another download worker since it was checked
+            else:
+                kwargs["headers"] = cache.get_conditional_headers(entry)
+        json = self.retriever.download_json(url, filename=filename, **kwargs)
+        if json is None:
+            headers = self.downloader.response.headers
+            json = cache.load(key, headers)
+            if json is None:
+                # Evicted by another download worker while being revalidated
+                del kwargs["headers"]
+                json = self.retriever.download_json(url, filename=filename, **kwargs)
+            else:
+                logger.info(f"{filename} is unchanged")
+                # Retrieve saved the empty body of the 304 response
+                self.save(json, filename)
+                return json
+        cache.store(key, json, self.downloader.response.headers)
+        return json
@@ -0,0 +1,66 @@
+"""
+Checkpoint:
+-----------
+
+Pages of an API download saved as they complete so that a rerun after a failure
+can resume rather than start again. Each page holds the next link so the saved
+pages are also the cursor.
+
+"""
+
+from glob import glob
+from os import makedirs, remove, replace
+from os.path import exists, join
+
+from hdx.utilities.loader import load_json
+from hdx.utilities.saver import save_json
+
+
+class PageCheckpoints:
+    # Keys of the first page that identify a download
+    identity = ("last_updated", "count", "next")
+
+    def __init__(self, folder, basename):
+        self.folder = folder
+        self.basename = basename
+        makedirs(folder, exist_ok=True)
+
+    def get_path(self, page):
+        return join(self.folder, f"{self.basename}_{page}.json")
+
+    def load(self, page):
+        path = self.get_path(page)
+        if not exists(path):
+            return None
+        return load_json(path)
+
+    def save(self, page, json):
+        # Written to a temporary file and renamed so a page is either complete
+        # or absent
+        path = self.get_path(page)
+        temp_path = f"{path}.tmp"
+        save_json(json, temp_path)
+        replace(temp_path, path)
+
+    def clear(self):
+        for path in glob(join(self.folder, f"{self.basename}_*.json*")):
+            remove(path)
+
+    def start(self, first_page):
+        """Start checkpointing a download given its first page. Checkpoints left
+        by a different download eg. one with an older last_updated are removed.
+
+        Args:
+            first_page (dict): First page of the download
+
+        Returns:
+            bool: Whether there are checkpoints to resume from
+        """
+        saved_page = self.load(0)
+        if saved_page and all(
+            saved_page.get(key) == first_page.get(key) for key in self.identity
+        ):
+            return True
+        self.clear()
+        self.save(0, first_page)
+        return False
@@ -0,0 +1,201 @@
+"""
+Client:
+-------
+
+Downloader for the Helix API that retries failed requests with exponential
+backoff and jitter, limits the rate of requests and records the latency, number
+of retries and size of each request. It is a Download so it can be given to
+Retrieve in place of one.
+
+"""
+
+import logging
+from random import uniform
+from threading import Lock
+from time import monotonic, perf_counter, sleep
+
+from requests import ConnectionError, HTTPError, Timeout
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError
+
+from hdx.utilities.downloader import Download, DownloadError
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spaces requests at least 1 / rate seconds apart across all threads. A rate
+    of None or 0 means no limit other than pauses asked for by the server."""
+
+    def __init__(self, rate=None):
+        if rate:
+            self.interval = 1 / rate
+        else:
+            self.interval = 0
+        self.next_time = 0
+        self.lock = Lock()
+
+    def wait(self):
+        with self.lock:
+            now = monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            sleep(wait_time)
+
+    def delay(self, seconds):
+        # Used when the server asks for a pause eg. via Retry-After
+        with self.lock:
+            self.next_time = max(self.next_time, monotonic() + seconds)
+
+
+class ClientStats:
+    def __init__(self):
+        self.requests = []
+        self.failures = 0
+        self.lock = Lock()
+
+    def add_request(self, url, latency, retries, size):
+        with self.lock:
+            self.requests.append(
+                {"url": url, "latency": latency, "retries": retries, "bytes": size}
+            )
+
+    def add_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def summary(self):
+        with self.lock:
+            latencies = [x["latency"] for x in self.requests]
+            return {
+                "requests": len(self.requests),
+                "retries": sum(x["retries"] for x in self.requests),
+                "bytes": sum(x["bytes"] for x in self.requests),
+                "failures": self.failures,
+                "mean_latency": sum(latencies) / len(latencies) if latencies else 0,
+                "max_latency": max(latencies, default=0),
+            }
+
+
+class GIDDClient(Download):
+    def __init__(
+        self,
+        retries=5,
+        backoff_factor=1,
+        max_backoff=60,
+        timeout=None,
+        rate_limit=None,
+        retry_statuses=(429, 500, 502, 503, 504),
+        pool_size=10,
+        **kwargs,
+    ):
+        """Downloader that retries requests that fail with a connection error,
+        timeout or one of retry_statuses. Waits before retry n (from 0) are a
+        random time up to min(max_backoff, backoff_factor * 2 ** n) seconds
+        unless the server sends a Retry-After header. download_json returns None
+        if a conditional request gets a 304 Not Modified response. It takes a
+        retries keyword argument to override the number of retries of a request.
+        Other keyword arguments are passed to Download.
+
+        Args:
+            retries (int): Maximum number of retries of a request. Defaults to 5.
+            backoff_factor (float): Base of backoff in seconds. Defaults to 1.
+            max_backoff (float): Maximum wait between retries. Defaults to 60.
+            timeout (float | None): Default timeout of a request. Defaults to None.
+            rate_limit (float | None): Maximum requests per second. Defaults to None.
+            retry_statuses (Sequence[int]): Statuses to retry. Defaults to (429, 500, 502, 503, 504).
+            pool_size (int): Number of connections to keep alive. Defaults to 10.
+        """
+        session = kwargs.get("session")
+        # Retrying is done here rather than by the session
+        kwargs["retry_attempts"] = 0
+        kwargs["status_forcelist"] = ()
+        super().__init__(**kwargs)
+        if not session:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.retry_statuses = frozenset(retry_statuses)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.stats = ClientStats()
+
+    def clone(self):
+        # Download objects hold the current response so each thread needs its
+        # own. Clones share the session, rate limiting and stats.
+        client = GIDDClient(
+            self.retries,
+            self.backoff_factor,
+            self.max_backoff,
+            self.timeout,
+            session=self.session,
+        )
+        client.retry_statuses = self.retry_statuses
+        client.rate_limiter = self.rate_limiter
+        client.stats = self.stats
+        return client
+
+    def get_retry_after(self, error):
+        # Returns seconds to wait before retrying or None if error is not
+        # retryable
+        while error is not None:
+            if isinstance(error, HTTPError):
+                response = error.response
+                if response is None or response.status_code not in self.retry_statuses:
+                    return None
+                retry_after = response.headers.get("Retry-After")
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except (TypeError, ValueError):
+                    return 0
+            if isinstance(error, (ConnectionError, Timeout, ChunkedEncodingError)):
+                return 0
+            error = error.__cause__
+        return None
+
+    def get_backoff(self, retry):
+        backoff = min(self.max_backoff, self.backoff_factor * 2**retry)
+        return uniform(0, backoff)
+
+    def download_json(self, url, **kwargs):
+        retries = kwargs.pop("retries", None)
+        if retries is None:
+            retries = self.retries
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        start = perf_counter()
+        retry = 0
+        while True:
+            self.rate_limiter.wait()
+            try:
+                super().download(url, **kwargs)
+                if self.response.status_code == 304:
+                    # The page is unchanged since a conditional request's
+                    # If-None-Match or If-Modified-Since
+                    json = None
+                else:
+                    json = self.get_json()
+                break
+            except Exception as e:
+                retry_after = self.get_retry_after(e)
+                if retry_after is None or retry == retries:
+                    self.stats.add_failure()
+                    if isinstance(e, DownloadError):
+                        raise
+                    raise DownloadError(f"Download of {url} failed!") from e
+                if retry_after:
+                    self.rate_limiter.delay(retry_after)
+                else:
+                    retry_after = self.get_backoff(retry)
+                    sleep(retry_after)
+                logger.warning(
+                    f"Download of {url} failed ({e.__cause__ or e}). Retrying in {retry_after:.1f}s."
+                )
+                retry += 1
+        size = len(self.response.content)
+        self.stats.add_request(url, perf_counter() - start, retry, size)
+        return json
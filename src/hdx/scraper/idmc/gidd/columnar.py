@@ -0,0 +1,140 @@
+"""
+Columnar:
+---------
+
+Compact in-memory store of the rows of an indicator held as one column per
+header rather than one dictionary per row.
+
+"""
+
+from array import array
+from sys import intern
+
+# Flags for integer columns marking values that are not integers
+NOT_NULL = 0
+EMPTY = 1
+NONE = 2
+NULLS = {EMPTY: "", NONE: None}
+
+
+class Column:
+    """Column of values. Integers are held in an array with a parallel array of
+    flags marking empty strings and Nones. If any other type of value is added,
+    the column becomes a list in which strings are interned and lists are held
+    as tuples so that repeated values are shared.
+    """
+
+    def __init__(self):
+        self.values = array("q")
+        self.flags = bytearray()
+        self.objects = None
+        self.has_tuples = False
+
+    def __len__(self):
+        if self.objects is None:
+            return len(self.values)
+        return len(self.objects)
+
+    def convert_to_objects(self):
+        objects = self.values.tolist()
+        for index, flag in enumerate(self.flags):
+            if flag:
+                objects[index] = NULLS[flag]
+        self.objects = objects
+        self.values = None
+        self.flags = None
+
+    def append_object(self, value):
+        value_type = type(value)
+        if value_type is str:
+            value = intern(value)
+        elif value_type is list:
+            value = tuple(intern(x) if type(x) is str else x for x in value)
+            self.has_tuples = True
+        self.objects.append(value)
+
+    def append(self, value):
+        if self.objects is not None:
+            self.append_object(value)
+        elif type(value) is int:
+            self.values.append(value)
+            self.flags.append(NOT_NULL)
+        elif value is None:
+            self.values.append(0)
+            self.flags.append(NONE)
+        elif value == "":
+            self.values.append(0)
+            self.flags.append(EMPTY)
+        else:
+            self.convert_to_objects()
+            self.append_object(value)
+
+    def take(self, indices=None):
+        """Get the values at the given indices or all values as a list"""
+        if self.objects is None:
+            values = self.values
+            flags = self.flags
+            if indices is None:
+                indices = range(len(values))
+            result = [NULLS[flags[i]] if flags[i] else values[i] for i in indices]
+        elif indices is None:
+            result = list(self.objects)
+        else:
+            objects = self.objects
+            result = [objects[i] for i in indices]
+        if self.has_tuples:
+            result = [list(x) if type(x) is tuple else x for x in result]
+        return result
+
+    def reorder(self, order):
+        if self.objects is None:
+            values = self.values
+            flags = self.flags
+            self.values = array("q", (values[i] for i in order))
+            self.flags = bytearray(flags[i] for i in order)
+        else:
+            objects = self.objects
+            self.objects = [objects[i] for i in order]
+
+
+class ColumnStore:
+    def __init__(self, headers):
+        self.headers = list(headers)
+        self.columns = [Column() for _ in self.headers]
+        self.no_rows = 0
+
+    def __len__(self):
+        return self.no_rows
+
+    def get_column(self, header):
+        return self.columns[self.headers.index(header)]
+
+    def add_rows(self, rows):
+        appends = [column.append for column in self.columns]
+        headers = self.headers
+        for row in rows:
+            for append, header in zip(appends, headers):
+                append(row.get(header))
+            self.no_rows += 1
+
+    def sort(self, sort_headers):
+        # sorted is stable so rows with equal keys stay in the order added
+        keys = list(zip(*(self.get_column(header).take() for header in sort_headers)))
+        order = sorted(range(self.no_rows), key=keys.__getitem__)
+        for column in self.columns:
+            column.reorder(order)
+
+    def get_indices_by_value(self, header):
+        indices_by_value = {}
+        for index, value in enumerate(self.get_column(header).take()):
+            indices = indices_by_value.get(value)
+            if indices is None:
+                indices = indices_by_value[value] = array("l")
+            indices.append(index)
+        return indices_by_value
+
+    def get_rows(self, indices=None):
+        """Get rows as lists of values in header order"""
+        columns = [column.take(indices) for column in self.columns]
+        for row in zip(*columns):
+            yield list(row)
@@ -0,0 +1,159 @@
+"""
+Instrumentation:
+----------------
+
+Timings of the stages of a run, counters and peak memory for a run report plus an
+optional profiler enabled by the GIDD_PROFILE environment variable.
+
+"""
+
+import logging
+from contextlib import contextmanager
+from os import getenv
+from threading import Lock
+from time import perf_counter
+
+try:
+    from resource import RUSAGE_SELF, getrusage
+except ImportError:
+    # resource is only available on Unix
+    getrusage = None
+
+logger = logging.getLogger(__name__)
+
+
+class Instrumentation:
+    def __init__(self):
+        self.start_time = perf_counter()
+        self.spans = {}
+        self.counters = {}
+        self.lock = Lock()
+
+    def add_time(self, name, elapsed, item=None):
+        with self.lock:
+            span = self.spans.get(name)
+            if span is None:
+                span = self.spans[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            span["count"] += 1
+            span["total"] += elapsed
+            span["max"] = max(span["max"], elapsed)
+            if item is not None:
+                items = span.setdefault("items", {})
+                items[item] = items.get(item, 0.0) + elapsed
+
+    @contextmanager
+    def span(self, name, item=None):
+        """Time the enclosed code under name and optionally also under an item
+        of name eg. a country.
+
+        Args:
+            name (str): Name of span eg. stage of the run
+            item (str | None): Item within span eg. country. Defaults to None.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start, item)
+
+    def timed_iter(self, name, iterator, item=None):
+        # Times only what is spent getting each value from iterator, not what
+        # the caller does with it
+        iterator = iter(iterator)
+        elapsed = 0.0
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += perf_counter() - start
+                yield value
+        finally:
+            self.add_time(name, elapsed, item)
+
+    def get_item_times(self, *names):
+        """Get the times of each item under the spans of the given names
+
+        Args:
+            *names (str): Names of spans eg. generate_country
+
+        Returns:
+            dict[str, dict[str, float]]: Times by span name by item
+        """
+        item_times = {}
+        with self.lock:
+            for name in names:
+                items = self.spans.get(name, {}).get("items", {})
+                for item, elapsed in items.items():
+                    item_times.setdefault(item, {})[name] = elapsed
+        return item_times
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @staticmethod
+    def get_peak_memory():
+        if getrusage is None:
+            return None
+        # ru_maxrss is in kilobytes on Linux
+        return getrusage(RUSAGE_SELF).ru_maxrss / 1024
+
+    def get_report(self):
+        with self.lock:
+            spans = {}
+            for name, span in self.spans.items():
+                span = dict(span)
+                if "items" in span:
+                    span["items"] = dict(span["items"])
+                spans[name] = span
+            return {
+                "wall_time": perf_counter() - self.start_time,
+                "peak_memory_mb": self.get_peak_memory(),
+                "spans": spans,
+                "counters": dict(self.counters),
+            }
+
+
+@contextmanager
+def profile():
+    """Profile the enclosed code if the GIDD_PROFILE environment variable is
+    cprofile or pyinstrument. The output is written to GIDD_PROFILE_OUTPUT which
+    defaults to profile.prof for cProfile and profile.html for pyinstrument.
+    pyinstrument is an optional dependency.
+    """
+    profiler_name = getenv("GIDD_PROFILE", "").lower()
+    output = getenv("GIDD_PROFILE_OUTPUT")
+    profiler = None
+    if profiler_name == "cprofile":
+        from cProfile import Profile
+
+        profiler = Profile()
+        profiler.enable()
+    elif profiler_name == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+        except ImportError:
+            logger.warning("pyinstrument is not installed so not profiling!")
+    elif profiler_name:
+        logger.warning(f"Unknown profiler {profiler_name} so not profiling!")
+    try:
+        yield profiler
+    finally:
+        if profiler_name == "cprofile":
+            profiler.disable()
+            output = output or "profile.prof"
+            profiler.dump_stats(output)
+            logger.info(f"Saved cProfile output to {output}")
+        elif profiler:
+            profiler.stop()
+            output = output or "profile.html"
+            with open(output, "w", encoding="utf-8") as file:
+                file.write(profiler.output_html())
+            logger.info(f"Saved pyinstrument output to {output}")
@@ -0,0 +1,64 @@
+"""
+Manifest:
+---------
+
+Records what was published for each indicator in the last successful run: the
+API's last_updated date, the row count and a hash of the rows of each country.
+
+"""
+
+import hashlib
+import json
+from os.path import exists
+
+from hdx.utilities.loader import load_json
+from hdx.utilities.saver import save_json
+
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        if exists(path):
+            self.data = load_json(path)
+        else:
+            self.data = {}
+
+    @staticmethod
+    def hash_rows(rows):
+        # Rows are lists of values in header order
+        hash = hashlib.sha256()
+        for row in rows:
+            hash.update(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+            hash.update(b"\n")
+        return hash.hexdigest()
+
+    def is_unchanged(self, name, last_updated, count):
+        indicator = self.data.get(name)
+        if not indicator:
+            return False
+        return indicator["last_updated"] == last_updated and indicator["count"] == count
+
+    def get_countries(self, name):
+        indicator = self.data.get(name, {})
+        return set(indicator.get("hashes", {}))
+
+    def get_changed_countries(self, name, hashes):
+        # Countries that are new, have changed or no longer have rows
+        old_hashes = self.data.get(name, {}).get("hashes", {})
+        changed = {
+            countryiso
+            for countryiso, hash in hashes.items()
+            if old_hashes.get(countryiso) != hash
+        }
+        changed.update(set(old_hashes) - set(hashes))
+        return changed
+
+    def update(self, name, last_updated, count, hashes):
+        self.data[name] = {
+            "last_updated": last_updated,
+            "count": count,
+            "hashes": hashes,
+        }
+
+    def save(self):
+        save_json(self.data, self.path, pretty=True, sortkeys=True)
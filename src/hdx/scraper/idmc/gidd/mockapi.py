@@ -0,0 +1,313 @@
+"""
+Mock API:
+---------
+
+Local stand-in for the Helix API serving GIDD pages of results with count, next,
+previous and last_updated from the saved pages of each indicator, optionally
+repeated to a larger size. Responses can be delayed and can fail at random so
+that downloading can be load tested without network. Pages have an ETag and a
+Last-Modified header and conditional requests for unchanged pages get 304 Not
+Modified.
+
+"""
+
+import hashlib
+import json
+from copy import copy
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from glob import glob
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import basename, join
+from random import Random
+from threading import Lock, Thread
+from time import sleep
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+class RepeatedRows:
+    """Rows repeated up to size without copying them so that large synthetic
+    datasets need little memory"""
+
+    def __init__(self, rows, size):
+        self.rows = rows
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        rows = self.rows
+        no_rows = len(rows)
+        return [rows[i % no_rows] for i in range(*index.indices(self.size))]
+
+
+def load_saved_rows(folder, name):
+    """Read the rows of an indicator from pages saved as name_0.json,
+    name_1.json etc.
+
+    Args:
+        folder (str): Folder of saved pages
+        name (str): Name of indicator
+
+    Returns:
+        tuple[list[dict], str]: Rows and last_updated of the first page
+    """
+    paths = glob(join(folder, f"{name}_*.json"))
+    paths.sort(key=lambda x: int(basename(x)[len(name) + 1 : -5]))
+    rows = []
+    last_updated = None
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            page = json.load(file)
+        if last_updated is None:
+            last_updated = page["last_updated"]
+        rows.extend(page["results"])
+    return rows, last_updated
+
+
+def get_endpoints(configuration, folder, size=None):
+    """Get the rows to serve at the path of the url of each indicator from its
+    saved pages, repeated up to size rows if given
+
+    Args:
+        configuration (Configuration): Project configuration
+        folder (str): Folder of saved pages
+        size (int | None): Number of rows of each indicator. Defaults to None.
+
+    Returns:
+        dict[str, dict]: Rows and last_updated by path
+    """
+    endpoints = {}
+    for indicator in configuration["indicators"]:
+        rows, last_updated = load_saved_rows(folder, indicator["name"])
+        if size:
+            rows = RepeatedRows(rows, size)
+        path = urlsplit(indicator["url"]).path
+        endpoints[path] = {"rows": rows, "last_updated": last_updated}
+    return endpoints
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        status, body, headers = self.server.api.respond(self.path, self.headers)
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockHelixAPI:
+    def __init__(
+        self,
+        endpoints,
+        latency=0,
+        jitter=0,
+        error_rate=0,
+        error_status=503,
+        max_limit=None,
+        seed=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        """Local server of GIDD pages. Each request waits latency plus a random
+        time up to jitter seconds then fails with error_status with probability
+        error_rate. Requests for more than max_limit rows fail with 504 like
+        requests that time out in the real API.
+
+        Args:
+            endpoints (dict[str, dict]): Rows and last_updated by path
+            latency (float): Seconds to wait before responding. Defaults to 0.
+            jitter (float): Maximum extra random wait in seconds. Defaults to 0.
+            error_rate (float): Proportion of requests that fail. Defaults to 0.
+            error_status (int): Status of failed requests. Defaults to 503.
+            max_limit (int | None): Largest page size served. Defaults to None.
+            seed (int | None): Seed of random waits and failures. Defaults to None.
+            host (str): Host to listen on. Defaults to 127.0.0.1.
+            port (int): Port to listen on. Defaults to 0 (any free port).
+        """
+        self.endpoints = endpoints
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_limit = max_limit
+        self.random = Random(seed)
+        self.server = ThreadingHTTPServer((host, port), MockAPIHandler)
+        self.server.daemon_threads = True
+        self.server.api = self
+        self.thread = None
+        self.lock = Lock()
+        self.active = 0
+        self.stats = {
+            "requests": 0,
+            "errors": 0,
+            "not_modified": 0,
+            "bytes": 0,
+            "max_concurrent": 0,
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def get_url(self, url):
+        # The url with the scheme and host of this server
+        _, _, path, query, fragment = urlsplit(url)
+        scheme, netloc, _, _, _ = urlsplit(self.base_url)
+        return urlunsplit((scheme, netloc, path, query, fragment))
+
+    def get_configuration(self, configuration):
+        """Get a copy of configuration with the indicator urls pointing at this
+        server
+
+        Args:
+            configuration (Configuration): Project configuration
+
+        Returns:
+            Configuration: Copy of configuration
+        """
+        configuration = copy(configuration)
+        indicators = []
+        for indicator in configuration["indicators"]:
+            indicator = dict(indicator)
+            indicator["url"] = self.get_url(indicator["url"])
+            indicators.append(indicator)
+        configuration["indicators"] = indicators
+        return configuration
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def get_page_url(self, path, params, offset):
+        if offset is None:
+            return None
+        params = dict(params)
+        params["offset"] = offset
+        return f"{self.base_url}{path}?{urlencode(params)}"
+
+    def get_page(self, path, query):
+        endpoint = self.endpoints[path]
+        rows = endpoint["rows"]
+        count = len(rows)
+        params = dict(parse_qsl(query))
+        limit = int(params.get("limit", 100))
+        offset = int(params.get("offset", 0))
+        # Parameters are in the order the real API gives them in next links
+        params = {x: params[x] for x in ("client_id", "format") if x in params}
+        params["limit"] = limit
+        if offset + limit < count:
+            next_offset = offset + limit
+        else:
+            next_offset = None
+        if offset > 0:
+            previous_offset = max(offset - limit, 0)
+        else:
+            previous_offset = None
+        return {
+            "last_updated": endpoint["last_updated"],
+            "count": count,
+            "next": self.get_page_url(path, params, next_offset),
+            "previous": self.get_page_url(path, params, previous_offset),
+            "results": rows[offset : offset + limit],
+        }
+
+    @staticmethod
+    def get_last_modified(last_updated):
+        day = date.fromisoformat(last_updated)
+        return format_datetime(
+            datetime.combine(day, time(), tzinfo=timezone.utc), usegmt=True
+        )
+
+    @staticmethod
+    def is_not_modified(request_headers, etag, last_modified):
+        if_none_match = request_headers.get("If-None-Match")
+        if if_none_match:
+            return etag in (x.strip() for x in if_none_match.split(","))
+        if_modified_since = request_headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return parsedate_to_datetime(last_modified) <= since
+        return False
+
+    def get_response(self, url):
+        path, query = urlsplit(url)[2:4]
+        if path not in self.endpoints:
+            return 404, {}
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+        if failed:
+            return self.error_status, {"detail": "Injected error"}
+        limit = int(dict(parse_qsl(query)).get("limit", 100))
+        if self.max_limit and limit > self.max_limit:
+            return 504, {"detail": f"Page size {limit} is too large"}
+        return 200, self.get_page(path, query)
+
+    def respond(self, url, request_headers=None):
+        """Respond to a request for url
+
+        Args:
+            url (str): Path and query of request
+            request_headers (Mapping[str, str] | None): Headers of request. Defaults to None.
+
+        Returns:
+            tuple[int, bytes, dict[str, str]]: Status, body and headers
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            self.active += 1
+            if self.active > self.stats["max_concurrent"]:
+                self.stats["max_concurrent"] = self.active
+            wait = self.latency + self.random.uniform(0, self.jitter)
+        try:
+            if wait:
+                sleep(wait)
+            status, json_body = self.get_response(url)
+            body = json.dumps(json_body).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+            if status == 200:
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                last_modified = self.get_last_modified(json_body["last_updated"])
+                headers["ETag"] = etag
+                headers["Last-Modified"] = last_modified
+                if self.is_not_modified(request_headers or {}, etag, last_modified):
+                    status = 304
+                    body = b""
+            with self.lock:
+                if status == 304:
+                    self.stats["not_modified"] += 1
+                elif status != 200:
+                    self.stats["errors"] += 1
+                self.stats["bytes"] += len(body)
+            return status, body, headers
+        finally:
+            with self.lock:
+                self.active -= 1
@@ -0,0 +1,133 @@
+"""
+Parallel:
+---------
+
+Run a function over an iterator in a thread pool while storing progress so that
+a crashed run can be resumed. The order of the iterator can be saved with the
+progress so that a resumed run goes through it in the same order.
+
+"""
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from os import getenv
+from os.path import exists
+
+from hdx.utilities.loader import load_json, load_text
+from hdx.utilities.path import get_wheretostart, progress_storing_folder
+from hdx.utilities.saver import save_json, save_text
+
+logger = logging.getLogger(__name__)
+
+
+def resumable_order(info, iterator, key):
+    """Get the dictionaries from iterator in the order saved in the progress
+    folder by the run being resumed, or save their order if there is none.
+    progress_storing_folder resumes from the position of a key value in the
+    iterator, so an order that depends on the data, eg. by size, could otherwise
+    change between runs and skip dictionaries. Dictionaries not in the saved
+    order come last in the order of iterator.
+
+    Args:
+        info (dict): Dictionary containing folder and anything else to be yielded
+        iterator (Iterable[dict]): Dictionaries to order
+        key (str): Key to examine from dictionary from iterator
+
+    Returns:
+        list[dict]: Dictionaries in order
+    """
+    order_file = info["folder"] / "order.json"
+    dicts = list(iterator)
+    if exists(order_file):
+        order = {x: i for i, x in enumerate(load_json(order_file))}
+        dicts.sort(key=lambda x: order.get(x[key], len(order)))
+    else:
+        save_json([x[key] for x in dicts], order_file)
+    return dicts
+
+
+def get_remaining(info, dicts, key):
+    """Get the dictionaries that progress_storing_folder would go through in a
+    resumed run ie. from the position given by WHERETOSTART or the progress file
+    onwards, without storing any progress. If that position is not found, all the
+    dictionaries are returned and progress_storing_folder raises the error.
+
+    Args:
+        info (dict): Dictionary containing folder and anything else to be yielded
+        dicts (Sequence[dict]): Dictionaries in order
+        key (str): Key to examine from dictionary from iterator
+
+    Returns:
+        list[dict]: Dictionaries still to go through
+    """
+    contents = getenv("WHERETOSTART")
+    if contents:
+        wheretostart = get_wheretostart(contents, "Environment variable", key)
+    else:
+        progress_file = info["folder"] / "progress.txt"
+        if not exists(progress_file):
+            return list(dicts)
+        contents = load_text(progress_file, strip=True)
+        wheretostart = get_wheretostart(contents, "File", key)
+    if not wheretostart:
+        return list(dicts)
+    if wheretostart == "IGNORE":
+        return []
+    keys = [x[key] for x in dicts]
+    if wheretostart not in keys:
+        return list(dicts)
+    return list(dicts[keys.index(wheretostart) :])
+
+
+def progress_storing_pool(info, iterator, key, function, max_workers):
+    """Call function on each dictionary from iterator using a pool of
+    max_workers threads. Which dictionaries are processed is determined by
+    progress_storing_folder so WHERETOSTART and the progress file work in the
+    same way. As the dictionaries can finish in any order, the progress file is
+    kept pointing at the earliest one that has not finished successfully so that
+    a resumed run does not skip any. An exception raised by function is logged
+    and collected rather than stopping the other dictionaries being processed.
+
+    Args:
+        info (dict): Dictionary containing folder and anything else to be yielded
+        iterator (Iterable[dict]): Iterate over this object persisting progress
+        key (str): Key to examine from dictionary from iterator
+        function (Callable[[dict], Any]): Function to call on each dictionary
+        max_workers (int): Maximum number of threads
+
+    Returns:
+        dict[str, Exception]: Exceptions raised by function by key value
+    """
+    progress_file = info["folder"] / "progress.txt"
+    unfinished = []
+    failures = {}
+    futures = {}
+
+    def save_progress():
+        if unfinished:
+            save_text(f"{key}={unfinished[0]}", progress_file)
+
+    def process_done(done):
+        for future in done:
+            current = futures.pop(future)
+            exception = future.exception()
+            if exception is None:
+                unfinished.remove(current)
+            else:
+                logger.error(f"{key}={current} failed! {exception}")
+                failures[current] = exception
+        save_progress()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _, nextdict in progress_storing_folder(info, iterator, key):
+            current = nextdict[key]
+            unfinished.append(current)
+            save_progress()
+            futures[executor.submit(function, nextdict)] = current
+            if len(futures) >= max_workers:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                process_done(done)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            process_done(done)
+    return failures
@@ -3,38 +3,95 @@
 IDMC:
 ------------
 
-Reads IDMC csvs and creates datasets.
+Reads IDMC csvs and creates datasets. The HDX dataset, showcase and country
+modules and slugify are imported when first used as downloading needs none of
+them.
 
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
-from operator import itemgetter
+from math import ceil
+from os.path import basename, join
+from threading import Lock, local
 
-from slugify import slugify
-
-from hdx.data.dataset import Dataset
-from hdx.data.hdxobject import HDXError
-from hdx.data.showcase import Showcase
-from hdx.location.country import Country
-from hdx.utilities.dictandlist import dict_of_lists_add
-from hdx.utilities.downloader import DownloadError
+from hdx.scraper.idmc.gidd.aggregate import get_source_headers, write_aggregates
+from hdx.scraper.idmc.gidd.checkpoint import PageCheckpoints
+from hdx.scraper.idmc.gidd.client import GIDDClient
+from hdx.scraper.idmc.gidd.columnar import ColumnStore
+from hdx.scraper.idmc.gidd.instrumentation import Instrumentation
+from hdx.scraper.idmc.gidd.store import RowStore
+from hdx.scraper.idmc.gidd.writer import get_filepath, write_csv, write_csvs
+from hdx.utilities.downloader import Download, DownloadError
 from hdx.utilities.url import get_url_for_get, get_url_params_for_post
 
 logger = logging.getLogger(__name__)
 
 
 class Pipeline:
-    def __init__(self, configuration, retriever, folder):
+    def __init__(
+        self,
+        configuration,
+        retriever,
+        folder,
+        download_workers=1,
+        streaming=False,
+        manifest=None,
+        uploads=None,
+        checkpoint=False,
+        snapshots=None,
+        scratch_folder=None,
+        aggregates=False,
+    ):
         self.configuration = configuration
         self.retriever = retriever
+        # Csvs are written to folder and checkpoints and row stores to
+        # scratch_folder which defaults to folder
         self.folder = folder
+        self.scratch_folder = scratch_folder or folder
+        self.download_workers = download_workers
+        self.streaming = streaming
+        self.manifest = manifest
+        self.uploads = uploads
+        self.checkpoint = checkpoint
+        self.snapshots = snapshots
+        self.aggregates = aggregates
+        self.instrumentation = Instrumentation()
+        self.thread_data = local()
         self.countries = set()
         self.indicator_data = {}
         self.countrymapping = {}
+        self.countrynames = {}
+        self.first_pages = {}
+        self.updated_indicators = set()
+        self.updated_countries = set()
+        self.showcase_urls = {}
+        self.filepaths = {}
+        self.aggregate_filepaths = {}
+        self.filepaths_lock = Lock()
+        # Rows of each indicator by country for worker processes to read
+        self.shared_rows = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        # Row stores are closed when the pipeline is finished with
+        for data in self.indicator_data.values():
+            store = data.get("store")
+            if store:
+                store.close()
 
     @staticmethod
     def get_dataset(title, name):
+        from slugify import slugify
+
+        from hdx.data.dataset import Dataset
+
         logger.info(f"Creating dataset: {title}")
         dataset = Dataset({"name": slugify(name).lower(), "title": title})
         dataset.set_maintainer("196196be-6037-4488-8b71-d786adf4c081")
@@ -43,55 +100,517 @@ class Pipeline:
         dataset.set_subnational(False)
         return dataset
 
-    def download_data(self, url, basename):
-        rows = []
-        rows_by_country = {}
-        i = 0
-        while url:
-            filename = f"{basename}_{i}.json"
-            json = self.retriever.download_json(url, filename=filename)
-            for row in json["results"]:
-                countryiso = row["iso3"]
-                self.countries.add(countryiso)
-                self.countrymapping[countryiso] = row["country_name"]
-                row["country_name"] = Country.get_country_name_from_iso3(countryiso)
-                for key in row:
-                    if row[key] is None:
-                        row[key] = ""
-                rows.append(row)
-                dict_of_lists_add(rows_by_country, countryiso, row)
-            url = json["next"]
-            if url:
-                url, params = get_url_params_for_post(url)
-                params.pop("client_id", None)
-                url = get_url_for_get(url, params)
-                i += 1
-        return rows, rows_by_country
+    @staticmethod
+    def get_url_without_client_id(url):
+        url, params = get_url_params_for_post(url)
+        params.pop("client_id", None)
+        return get_url_for_get(url, params)
 
-    def download_indicators(self):
-        indicators = self.configuration["indicators"]
-        for indicator in indicators:
-            url = indicator["url"]
+    @staticmethod
+    def get_url_with_page_size(url, page_size):
+        url, params = get_url_params_for_post(url)
+        params["limit"] = page_size
+        return get_url_for_get(url, params)
+
+    @staticmethod
+    def get_page_size(url):
+        _, params = get_url_params_for_post(url)
+        return int(params["limit"])
+
+    @staticmethod
+    def get_offset_urls(next_url, count):
+        # The next link of the first page is used rather than the configured url
+        # because it has the page size that the server accepted
+        url, params = get_url_params_for_post(next_url)
+        params.pop("client_id", None)
+        limit = int(params["limit"])
+        urls = []
+        for i in range(1, ceil(count / limit)):
+            params["offset"] = i * limit
+            urls.append(get_url_for_get(url, params))
+        return urls
+
+    def get_page_sizes(self, indicator):
+        page_size = indicator.get("page_size", self.configuration["page_size"])
+        if page_size == "adaptive":
+            return self.configuration["adaptive_page_sizes"]
+        return [page_size]
+
+    def get_thread_retriever(self):
+        # Download objects hold the current response so cannot be shared between
+        # threads. Each thread gets a clone of the retriever with its own Download
+        # that reuses the session (and so the extra parameters) of the original.
+        retriever = getattr(self.thread_data, "retriever", None)
+        if retriever is None:
+            downloader = self.retriever.downloader
+            if isinstance(downloader, GIDDClient):
+                downloader = downloader.clone()
+            else:
+                downloader = Download(session=downloader.session)
+            retriever = self.retriever.clone(downloader)
+            self.thread_data.retriever = retriever
+        return retriever
+
+    def download_first_page(self, url, basename, page_sizes):
+        # Page sizes are tried largest first, backing off to the next one down if
+        # the request fails or times out. Requests for sizes other than the
+        # smallest are not retried so that a size that is too large fails fast.
+        filename = f"{basename}_0.json"
+        if len(page_sizes) == 1:
+            kwargs = {}
+        else:
+            kwargs = {"timeout": self.configuration["adaptive_timeout"]}
+        last_index = len(page_sizes) - 1
+        set_retries = isinstance(self.retriever.downloader, GIDDClient)
+        for i, page_size in enumerate(page_sizes):
+            page_url = self.get_url_with_page_size(url, page_size)
+            if set_retries:
+                if i == last_index:
+                    kwargs.pop("retries", None)
+                else:
+                    kwargs["retries"] = 0
+            try:
+                json = self.retriever.download_json(
+                    page_url, filename=filename, **kwargs
+                )
+                return json, page_size, i + 1
+            except DownloadError:
+                if i == last_index:
+                    raise
+                logger.warning(
+                    f"Download of {basename} with page size {page_size} failed. Trying {page_sizes[i + 1]}."
+                )
+
+    def get_checkpoints(self, basename, first_page):
+        # Pages are saved in the run folder which is kept if the run fails
+        if not self.checkpoint:
+            return None
+        checkpoints = PageCheckpoints(
+            join(self.scratch_folder, "checkpoints"), basename
+        )
+        if checkpoints.start(first_page):
+            logger.info(f"Resuming download of {basename} from checkpoints")
+        return checkpoints
+
+    def get_page(self, retriever, url, basename, page, checkpoints):
+        # Returns the page and whether it had to be downloaded
+        if checkpoints:
+            json = checkpoints.load(page)
+            if json is not None:
+                return json, False
+        json = retriever.download_json(url, filename=f"{basename}_{page}.json")
+        if checkpoints:
+            checkpoints.save(page, json)
+        return json, True
+
+    def download_pages(self, url, basename, page_sizes):
+        first_page = self.first_pages.pop(basename, None)
+        if first_page is None:
+            first_page = self.download_first_page(url, basename, page_sizes)
+        json, page_size, no_requests = first_page
+        checkpoints = self.get_checkpoints(basename, json)
+        count = json["count"]
+        no_pages = 1
+        no_rows = len(json["results"])
+        yield json
+        url = json["next"]
+        if url:
+            # When using saved data, the page size is the one used when saving
+            page_size = self.get_page_size(url)
+        if url and self.download_workers > 1:
+            urls = self.get_offset_urls(url, count)
+            logger.info(
+                f"Downloading {len(urls)} further pages of {basename} with {self.download_workers} workers"
+            )
+
+            def get_offset_page(page, url):
+                retriever = self.get_thread_retriever()
+                return self.get_page(retriever, url, basename, page, checkpoints)
+
+            with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+                # map returns results in the order of the urls ie. by offset
+                pages = range(1, len(urls) + 1)
+                for json, downloaded in executor.map(get_offset_page, pages, urls):
+                    no_requests += downloaded
+                    no_pages += 1
+                    no_rows += len(json["results"])
+                    yield json
+        else:
+            page = 1
+            while url:
+                url = self.get_url_without_client_id(url)
+                json, downloaded = self.get_page(
+                    self.retriever, url, basename, page, checkpoints
+                )
+                no_requests += downloaded
+                no_pages += 1
+                no_rows += len(json["results"])
+                yield json
+                url = json["next"]
+                page += 1
+        logger.info(
+            f"Downloaded {basename} with page size {page_size} in {no_requests} requests"
+        )
+        self.instrumentation.count("pages", no_pages)
+        self.instrumentation.count("requests", no_requests)
+        self.instrumentation.count("rows", no_rows)
+        if no_rows != count:
+            raise DownloadError(
+                f"Downloaded {no_rows} rows of {basename} but count is {count}!"
+            )
+
+    def get_country_name(self, countryiso):
+        # Looked up once per country rather than once per row
+        if countryiso not in self.countrynames:
+            from hdx.location.country import Country
+
+            countryname = Country.get_country_name_from_iso3(countryiso)
+            self.countrynames[countryiso] = countryname
+        return self.countrynames[countryiso]
+
+    def normalise_rows(self, rows, headers):
+        # Only None values in columns that are output need replacing
+        countries = self.countries
+        countrymapping = self.countrymapping
+        countrynames = self.countrynames
+        for row in rows:
+            countryiso = row["iso3"]
+            countryname = countrynames.get(countryiso)
+            if countryname is None:
+                countryname = self.get_country_name(countryiso)
+            countries.add(countryiso)
+            countrymapping[countryiso] = row["country_name"]
+            row["country_name"] = countryname
+            for header in headers:
+                if row.get(header) is None:
+                    row[header] = ""
+            yield row
+
+    def get_normalised_rows(self, indicator):
+        name = indicator["name"]
+        page_sizes = self.get_page_sizes(indicator)
+        headers = indicator["headers"]
+        pages = self.download_pages(indicator["url"], name, page_sizes)
+        for json in self.instrumentation.timed_iter("download_pages", pages, name):
+            yield from self.normalise_rows(json["results"], headers)
+
+    def download_data(self, indicator):
+        # Rows are sorted once. As the sort is stable, partitioning the sorted
+        # rows by country gives each country's rows in sorted order.
+        rows = ColumnStore(indicator["headers"])
+        rows.add_rows(self.get_normalised_rows(indicator))
+        with self.instrumentation.span("sort", indicator["name"]):
+            rows.sort(indicator["sort"])
+        return self.get_indicator_data(rows)
+
+    @staticmethod
+    def get_indicator_data(rows):
+        rows_by_country = rows.get_indices_by_value("iso3")
+        year_column = rows.get_column("year").take()
+        years_by_country = {
+            countryiso: {year_column[i] for i in indices}
+            for countryiso, indices in rows_by_country.items()
+        }
+        return {
+            "rows": rows,
+            "rows_by_country": rows_by_country,
+            "years": set(year_column),
+            "years_by_country": years_by_country,
+        }
+
+    def stream_data(self, indicator):
+        # Rows are written to disk page by page as they are downloaded
+        name = indicator["name"]
+        store = RowStore(join(self.scratch_folder, f"{name}.sqlite"), indicator)
+        store.add_rows(self.get_normalised_rows(indicator))
+        return store
+
+    def snapshot_data(self, indicator):
+        # The first page is downloaded to check if the snapshot is up to date.
+        # If it is not, the first page is kept for download_pages.
+        name = indicator["name"]
+        first_page = self.first_pages.get(name)
+        if first_page is None:
+            page_sizes = self.get_page_sizes(indicator)
+            first_page = self.download_first_page(indicator["url"], name, page_sizes)
+            self.first_pages[name] = first_page
+        json = first_page[0]
+        last_updated = json["last_updated"]
+        count = json["count"]
+        with self.instrumentation.span("load_snapshot", name):
+            snapshot = self.snapshots.load(name, last_updated, count)
+        if snapshot:
+            logger.info(f"Loaded {name} from snapshot")
+            del self.first_pages[name]
+            rows, metadata = snapshot
+            countrymapping = metadata["countrymapping"]
+            self.countries.update(countrymapping)
+            self.countrymapping.update(countrymapping)
+            return self.get_indicator_data(rows)
+        data = self.download_data(indicator)
+        countrymapping = {x: self.countrymapping[x] for x in data["rows_by_country"]}
+        self.snapshots.save(name, data["rows"], last_updated, count, countrymapping)
+        return data
+
+    def download_indicator(self, indicator):
+        name = indicator["name"]
+        with self.instrumentation.span("download", name):
+            if self.streaming:
+                self.indicator_data[name] = {"store": self.stream_data(indicator)}
+            elif self.snapshots:
+                self.indicator_data[name] = self.snapshot_data(indicator)
+            else:
+                self.indicator_data[name] = self.download_data(indicator)
+
+    def get_country_hashes(self, indicator):
+        hashes = {}
+        for countryiso in sorted(self.countries):
+            if not self.has_rows(indicator, countryiso):
+                continue
+            rows = self.get_rows(indicator, countryiso)
+            hashes[countryiso] = self.manifest.hash_rows(rows)
+        return hashes
+
+    def download_updated_indicators(self):
+        # The first page of each indicator is downloaded to compare its
+        # last_updated and count with the manifest. Unchanged indicators are only
+        # downloaded in full if country datasets that need them have changed.
+        unchanged_indicators = []
+        for indicator in self.get_indicators():
             name = indicator["name"]
-            rows, rows_by_country = self.download_data(url, name)
-            self.indicator_data[name] = {
-                "rows": rows,
-                "rows_by_country": rows_by_country,
-            }
+            page_sizes = self.get_page_sizes(indicator)
+            first_page = self.download_first_page(indicator["url"], name, page_sizes)
+            self.first_pages[name] = first_page
+            json = first_page[0]
+            last_updated = json["last_updated"]
+            count = json["count"]
+            if self.manifest.is_unchanged(name, last_updated, count):
+                unchanged_indicators.append(indicator)
+                continue
+            logger.info(f"{name} has been updated on {last_updated}")
+            self.download_indicator(indicator)
+            hashes = self.get_country_hashes(indicator)
+            changed_countries = self.manifest.get_changed_countries(name, hashes)
+            self.updated_countries.update(changed_countries)
+            self.updated_indicators.add(name)
+            self.manifest.update(name, last_updated, count, hashes)
+        for indicator in unchanged_indicators:
+            name = indicator["name"]
+            if self.manifest.get_countries(name) & self.updated_countries:
+                logger.info(f"{name} is unchanged but needed by updated countries")
+                self.download_indicator(indicator)
+            else:
+                logger.info(f"{name} is unchanged so skipping download")
+                del self.first_pages[name]
+
+    def download_indicators(self):
+        if self.manifest:
+            self.download_updated_indicators()
+            return
+        for indicator in self.get_indicators():
+            self.download_indicator(indicator)
+
+    def has_rows(self, indicator, countryiso):
+        data = self.indicator_data.get(indicator["name"])
+        if not data:
+            return False
+        if self.streaming:
+            return data["store"].has_country(countryiso)
+        return bool(data["rows_by_country"].get(countryiso))
+
+    def get_country_rows(self, countryiso):
+        # Number of rows of a country across the downloaded indicators
+        no_rows = 0
+        for data in self.indicator_data.values():
+            if self.streaming:
+                no_rows += data["store"].count_country(countryiso)
+            else:
+                no_rows += len(data["rows_by_country"].get(countryiso, ()))
+        return no_rows
+
+    def get_rows(self, indicator, countryiso=None):
+        # Rows are returned sorted as lists of values in header order
+        data = self.indicator_data[indicator["name"]]
+        if self.streaming:
+            rows = data["store"].get_sorted_rows(countryiso)
+            return self.serialise_rows(rows, indicator["headers"])
+        if countryiso:
+            indices = data["rows_by_country"][countryiso]
+        else:
+            indices = None
+        return data["rows"].get_rows(indices)
+
+    def get_years(self, indicator, countryiso=None):
+        data = self.indicator_data[indicator["name"]]
+        if self.streaming:
+            return data["store"].get_years(countryiso)
+        if countryiso:
+            return data["years_by_country"][countryiso]
+        return data["years"]
+
+    def get_columns(self, indicator, headers):
+        # Returns values by header
+        data = self.indicator_data[indicator["name"]]
+        if not self.streaming:
+            return {x: data["rows"].get_column(x).take() for x in headers}
+        indices = [indicator["headers"].index(x) for x in headers]
+        columns = {x: [] for x in headers}
+        for row in self.get_rows(indicator):
+            for header, index in zip(headers, indices):
+                columns[header].append(row[index])
+        return columns
+
+    @staticmethod
+    def serialise_rows(rows, headers):
+        # Each row is output as a list of values in header order
+        for row in rows:
+            yield [row.get(header) for header in headers]
+
+    def get_filepaths(self, indicator):
+        # The global and all country csvs of an indicator are written together
+        # the first time any of them is needed
+        key = indicator["name"]
+        with self.filepaths_lock:
+            filepaths = self.filepaths.get(key)
+            if filepaths is None:
+                with self.instrumentation.span("write_csvs", key):
+                    if key in self.shared_rows:
+                        # Country csvs are written by worker processes
+                        filepath = write_csv(
+                            get_filepath(self.folder, indicator["title"]),
+                            indicator["headers"],
+                            self.get_rows(indicator),
+                        )
+                        filepaths = {None: filepath}
+                    else:
+                        filepaths = write_csvs(
+                            self.folder,
+                            indicator["title"],
+                            indicator["headers"],
+                            self.get_rows(indicator),
+                            indicator["flatten"],
+                        )
+                self.filepaths[key] = filepaths
+        return filepaths
+
+    def get_aggregates(self, indicator):
+        # Aggregates are published only if turned on
+        if not self.aggregates:
+            return ()
+        return indicator.get("aggregates", ())
+
+    def get_aggregate_filepaths(self, indicator):
+        # All aggregates of an indicator are computed and written the first time
+        # any of them is needed
+        key = indicator["name"]
+        aggregates = self.get_aggregates(indicator)
+        if not aggregates:
+            return {}
+        with self.filepaths_lock:
+            filepaths = self.aggregate_filepaths.get(key)
+            if filepaths is None:
+                with self.instrumentation.span("aggregate", key):
+                    headers = get_source_headers(aggregates)
+                    columns = self.get_columns(indicator, headers)
+                    filepaths = write_aggregates(self.folder, aggregates, columns)
+                self.aggregate_filepaths[key] = filepaths
+        return filepaths
+
+    def get_country_filepath(self, indicator, countryiso):
+        shared_rows = self.shared_rows.get(indicator["name"])
+        if shared_rows is None:
+            return self.get_filepaths(indicator)[countryiso]
+        return write_csv(
+            get_filepath(self.folder, indicator["title"], countryiso),
+            indicator["headers"],
+            shared_rows.get_rows(countryiso),
+            indicator["flatten"],
+        )
+
+    def add_resource(self, dataset, filepath, resourcedata):
+        from hdx.data.resource import Resource
+
+        resource = Resource(resourcedata)
+        resource.set_format("csv")
+        upload = None
+        if self.uploads:
+            upload = self.uploads.get_upload(
+                dataset["name"], resourcedata["name"], filepath
+            )
+        if upload:
+            # The file is the same as the one already in HDX so only the
+            # metadata needs updating
+            resource.update(upload)
+            resource["resource_type"] = "file.upload"
+            resource["url_type"] = "upload"
+            logger.info(f"Not uploading {basename(filepath)} as it is unchanged")
+        else:
+            resource.set_file_to_upload(filepath)
+        dataset.add_update_resource(resource)
+
+    @staticmethod
+    def has_uploads(dataset):
+        return any(x.get_file_to_upload() for x in dataset.get_resources())
 
     def get_countryiso3s(self):
-        return [{"iso3": countryiso} for countryiso in sorted(self.countries)]
+        countries = self.countries
+        if self.manifest:
+            countries = countries & self.updated_countries
+        return [{"iso3": countryiso} for countryiso in sorted(countries)]
+
+    def get_country_queue(self):
+        """Get the countries to process with their number of rows, largest
+        first so that the countries that take longest are started first. Ties
+        are broken by iso3 so that the order is the same on every run with the
+        same data.
+
+        Returns:
+            list[dict]: Countries with keys iso3 and rows
+        """
+        countries = self.get_countryiso3s()
+        for country in countries:
+            country["rows"] = self.get_country_rows(country["iso3"])
+        countries.sort(key=lambda x: (-x["rows"], x["iso3"]))
+        return countries
 
     def get_indicators(self):
         return self.configuration["indicators"]
 
+    def get_showcase_url(self, countryiso):
+        internal_countryname = self.countrymapping[countryiso]
+        return f"http://www.internal-displacement.org/countries/{internal_countryname.replace(' ', '-')}/"
+
+    def check_showcase_urls(self, urlchecker):
+        urls = [self.get_showcase_url(x["iso3"]) for x in self.get_countryiso3s()]
+        self.showcase_urls = urlchecker.check(urls)
+
+    def showcase_url_exists(self, url):
+        url_exists = self.showcase_urls.get(url)
+        if url_exists is not None:
+            return url_exists
+        try:
+            self.get_thread_retriever().downloader.setup(url)
+        except DownloadError:
+            return False
+        return True
+
+    def get_updated_indicators(self):
+        indicators = self.get_indicators()
+        if not self.manifest:
+            return indicators
+        return [x for x in indicators if x["name"] in self.updated_indicators]
+
     def generate_indicator_datasets_and_showcase(self):
         orig_tags = self.configuration["tags"]
+        # The showcase has the tags of every indicator, not only those updated,
+        # as its tags in HDX are replaced
         tags = copy(orig_tags)
+        for indicator in self.get_indicators():
+            tags += indicator["tags"]
         notes_lookup = self.configuration["notes"]
         first_part = notes_lookup["first_part"]
         datasets = dict()
-        for indicator in self.get_indicators():
+        for indicator in self.get_updated_indicators():
             name = indicator["title"]
             title = name
             dataset = self.get_dataset(title, f"idmc-{name}")
@@ -99,24 +618,26 @@ class Pipeline:
             notes = f"{first_part}\n\n{notes_lookup[key]}"
             dataset["notes"] = notes
             dataset.add_other_location("world")
-            rows = self.indicator_data[key]["rows"]
-            rows = sorted(rows, key=itemgetter(*indicator["sort"]))
-            years = set()
-            for row in rows:
-                year = row["year"]
-                years.add(year)
+            years = self.get_years(indicator)
             resourcedata = {"name": name, "description": title}
-            filename = f"{name}.csv"
-            dataset.generate_resource(
-                self.folder, filename, rows, resourcedata, indicator["headers"]
-            )
+            filepath = self.get_filepaths(indicator)[None]
+            self.add_resource(dataset, filepath, resourcedata)
+            aggregate_filepaths = self.get_aggregate_filepaths(indicator)
+            for aggregate in self.get_aggregates(indicator):
+                aggregate_title = aggregate["title"]
+                resourcedata = {"name": aggregate_title, "description": aggregate_title}
+                filepath = aggregate_filepaths[aggregate["name"]][None]
+                self.add_resource(dataset, filepath, resourcedata)
             indicator_tags = indicator["tags"]
             dataset.add_tags(orig_tags + indicator_tags)
-            tags += indicator_tags
             years = sorted(years)
             dataset.set_time_period_year_range(years[0], years[-1])
             datasets[key] = dataset
 
+        from slugify import slugify
+
+        from hdx.data.showcase import Showcase
+
         title = "IDMC Global Report on Internal Displacement"
         slugified_name = slugify(title).lower()
         showcase = Showcase(
@@ -132,9 +653,12 @@ class Pipeline:
         return datasets, showcase
 
     def generate_country_dataset_and_showcase(self, countryiso):
+        from hdx.data.hdxobject import HDXError
+        from hdx.data.showcase import Showcase
+
         tags = copy(self.configuration["tags"])
         country_dataset = self.configuration["country_dataset"]
-        countryname = Country.get_country_name_from_iso3(countryiso)
+        countryname = self.get_country_name(countryiso)
         name = country_dataset["name"]
         title = country_dataset["title"]
         dataset = self.get_dataset(f"{countryname} - {title}", f"{name}{countryiso}")
@@ -147,33 +671,32 @@ class Pipeline:
         years = set()
         for indicator in self.get_indicators():
             name = indicator["title"]
-            key = indicator["name"]
-            rows = self.indicator_data[key]["rows_by_country"].get(countryiso)
-            if not rows:
+            if not self.has_rows(indicator, countryiso):
                 continue
-            rows = sorted(rows, key=itemgetter(*indicator["sort"]))
-            for row in rows:
-                year = row["year"]
-                years.add(year)
-                for header in indicator["flatten"]:
-                    row[header] = ",".join(row[header])
+            years.update(self.get_years(indicator, countryiso))
             resourcedata = {
                 "name": name,
                 "description": f"{name} for {countryname}",
             }
-            filename = f"{name}_{countryiso}.csv"
-            dataset.generate_resource(
-                self.folder, filename, rows, resourcedata, indicator["headers"]
-            )
+            filepath = self.get_country_filepath(indicator, countryiso)
+            self.add_resource(dataset, filepath, resourcedata)
+            aggregate_filepaths = self.get_aggregate_filepaths(indicator)
+            for aggregate in self.get_aggregates(indicator):
+                filepath = aggregate_filepaths[aggregate["name"]].get(countryiso)
+                if not filepath:
+                    continue
+                aggregate_title = aggregate["title"]
+                resourcedata = {
+                    "name": aggregate_title,
+                    "description": f"{aggregate_title} for {countryname}",
+                }
+                self.add_resource(dataset, filepath, resourcedata)
             tags += indicator["tags"]
         dataset.add_tags(tags)
         years = sorted(years)
         dataset.set_time_period_year_range(years[0], years[-1])
-        internal_countryname = self.countrymapping[countryiso]
-        url = f"http://www.internal-displacement.org/countries/{internal_countryname.replace(' ', '-')}/"
-        try:
-            self.retriever.downloader.setup(url)
-        except DownloadError:
+        url = self.get_showcase_url(countryiso)
+        if not self.showcase_url_exists(url):
             return dataset, None
         showcase = Showcase(
             {
@@ -0,0 +1,200 @@
+"""
+Processes:
+----------
+
+Generates country datasets in chunks in a pool of worker processes. The rows of
+each indicator are written once by country to a file that workers memory map so
+that rows are not pickled per task. Workers write the country csvs and return
+lightweight descriptors from which the parent makes Dataset and Showcase objects.
+
+"""
+
+import logging
+import marshal
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from mmap import ACCESS_READ, mmap
+from multiprocessing import get_context
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from hdx.scraper.idmc.gidd.writer import get_filepath
+
+logger = logging.getLogger(__name__)
+
+# Set in the parent process before forking so that worker processes inherit it
+_pipeline = None
+
+
+class SharedRows:
+    """Rows of an indicator by country held in a file in which the rows of each
+    country are a marshalled list. The file is memory mapped when first read."""
+
+    def __init__(self, path, offsets):
+        self.path = path
+        self.offsets = offsets
+        self.mmap = None
+
+    @classmethod
+    def write(cls, path, rows_by_country):
+        """Write rows by country to a file
+
+        Args:
+            path (str): Path of file to write
+            rows_by_country (Iterable[tuple[str, Iterable[list]]]): Countries and their rows
+
+        Returns:
+            SharedRows: Rows by country
+        """
+        offsets = {}
+        position = 0
+        with open(path, "wb") as file:
+            for countryiso, rows in rows_by_country:
+                data = marshal.dumps(list(rows))
+                file.write(data)
+                offsets[countryiso] = (position, len(data))
+                position += len(data)
+        return cls(path, offsets)
+
+    def get_rows(self, countryiso):
+        if self.mmap is None:
+            with open(self.path, "rb") as file:
+                self.mmap = mmap(file.fileno(), 0, access=ACCESS_READ)
+        offset, length = self.offsets[countryiso]
+        return marshal.loads(self.mmap[offset : offset + length])
+
+
+def share_rows(pipeline, folder):
+    # The global csvs and aggregates are written here. Indicators whose csvs
+    # have all been written already are not shared.
+    for indicator in pipeline.get_indicators():
+        name = indicator["name"]
+        if name not in pipeline.indicator_data:
+            continue
+        pipeline.get_aggregate_filepaths(indicator)
+        if name in pipeline.filepaths:
+            continue
+        countryiso3s = [
+            x for x in sorted(pipeline.countries) if pipeline.has_rows(indicator, x)
+        ]
+        rows_by_country = ((x, pipeline.get_rows(indicator, x)) for x in countryiso3s)
+        pipeline.shared_rows[name] = SharedRows.write(
+            join(folder, f"{name}.rows"), rows_by_country
+        )
+        pipeline.get_filepaths(indicator)
+
+
+def unshare_rows(pipeline, countryiso3s):
+    # Adds the country csvs written by worker processes to the pipeline's
+    # filepaths so that they are not written again
+    for indicator in pipeline.get_indicators():
+        shared_rows = pipeline.shared_rows.pop(indicator["name"], None)
+        if shared_rows is None:
+            continue
+        filepaths = pipeline.filepaths[indicator["name"]]
+        for countryiso in countryiso3s:
+            if countryiso in shared_rows.offsets:
+                filepaths[countryiso] = get_filepath(
+                    pipeline.folder, indicator["title"], countryiso
+                )
+
+
+def get_descriptor(dataset, showcase):
+    if dataset is None:
+        return None
+    resources = [
+        {"metadata": resource.data, "file": resource.get_file_to_upload()}
+        for resource in dataset.get_resources()
+    ]
+    return {
+        "dataset": dataset.data,
+        "resources": resources,
+        "showcase": showcase.data if showcase else None,
+    }
+
+
+def get_dataset_and_showcase(descriptor):
+    from hdx.data.dataset import Dataset
+    from hdx.data.resource import Resource
+    from hdx.data.showcase import Showcase
+
+    if descriptor is None:
+        return None, None
+    dataset = Dataset(descriptor["dataset"])
+    for resourcedata in descriptor["resources"]:
+        resource = Resource(resourcedata["metadata"])
+        if resourcedata["file"]:
+            resource.set_file_to_upload(resourcedata["file"])
+        dataset.add_update_resource(resource)
+    showcasedata = descriptor["showcase"]
+    if showcasedata:
+        showcase = Showcase(showcasedata)
+    else:
+        showcase = None
+    return dataset, showcase
+
+
+def generate_chunk(countryiso3s):
+    results = []
+    for countryiso in countryiso3s:
+        start = perf_counter()
+        dataset, showcase = _pipeline.generate_country_dataset_and_showcase(countryiso)
+        descriptor = get_descriptor(dataset, showcase)
+        results.append((countryiso, descriptor, perf_counter() - start))
+    return results
+
+
+def generate_country_datasets(pipeline, countryiso3s, processes=1, chunksize=None):
+    """Generate the datasets and showcases of countries. With more than one
+    process, countries are dealt into chunks in turn, so that if they are given
+    largest first, each chunk has a mix of large and small countries and the
+    largest are started first. Chunks are generated in a pool of forked
+    processes. In streaming mode, countries are generated in this process
+    as the SQLite store cannot be used across a fork. Timings are recorded under
+    generate_country.
+
+    Args:
+        pipeline (Pipeline): Pipeline with downloaded indicators
+        countryiso3s (list[str]): Countries to generate
+        processes (int): Number of processes. Defaults to 1.
+        chunksize (int | None): Countries per chunk. Defaults to None (4 chunks per process).
+
+    Returns:
+        dict[str, tuple[Dataset | None, Showcase | None]]: Dataset and showcase by country
+    """
+    global _pipeline
+    instrumentation = pipeline.instrumentation
+    results = {}
+    if processes < 2 or pipeline.streaming:
+        for countryiso in countryiso3s:
+            with instrumentation.span("generate_country", countryiso):
+                results[countryiso] = pipeline.generate_country_dataset_and_showcase(
+                    countryiso
+                )
+        return results
+    if chunksize is None:
+        chunksize = max(1, ceil(len(countryiso3s) / (processes * 4)))
+    no_chunks = ceil(len(countryiso3s) / chunksize)
+    chunks = [countryiso3s[i::no_chunks] for i in range(no_chunks)]
+    logger.info(
+        f"Generating {len(countryiso3s)} country datasets in {len(chunks)} chunks with {processes} processes"
+    )
+    with TemporaryDirectory(prefix="gidd_rows_") as folder:
+        with instrumentation.span("share_rows"):
+            share_rows(pipeline, folder)
+        _pipeline = pipeline
+        try:
+            with ProcessPoolExecutor(
+                processes, mp_context=get_context("fork")
+            ) as executor:
+                for chunk in executor.map(generate_chunk, chunks):
+                    for countryiso, descriptor, elapsed in chunk:
+                        instrumentation.add_time(
+                            "generate_country", elapsed, countryiso
+                        )
+                        results[countryiso] = get_dataset_and_showcase(descriptor)
+        finally:
+            _pipeline = None
+            unshare_rows(pipeline, countryiso3s)
+    return results
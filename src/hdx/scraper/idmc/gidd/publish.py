@@ -0,0 +1,93 @@
+"""
+Publish:
+--------
+
+Creates datasets and showcases in HDX with as few calls as possible. Resources
+are put in their final order before a dataset is created so that HDX only needs
+to reorder them if they are out of order there. The datasets of a showcase are
+read once and only missing datasets are added, each with its own association
+call. Calls to HDX are counted by action for the run report.
+
+"""
+
+from threading import Lock
+
+
+class HDXCallCounter:
+    """Wrapper of Configuration.call_remoteckan that counts the calls of each
+    action"""
+
+    def __init__(self, call_remoteckan):
+        self.call_remoteckan = call_remoteckan
+        self.calls = {}
+        self.lock = Lock()
+
+    def __call__(self, action, *args, **kwargs):
+        with self.lock:
+            self.calls[action] = self.calls.get(action, 0) + 1
+        return self.call_remoteckan(action, *args, **kwargs)
+
+    def summary(self):
+        with self.lock:
+            return {"calls": sum(self.calls.values()), "actions": dict(self.calls)}
+
+
+def count_hdx_calls(configuration):
+    """Count the calls made to HDX through configuration. All HDX objects make
+    their calls through Configuration.call_remoteckan, which is wrapped on this
+    configuration.
+
+    Args:
+        configuration (Configuration): HDX configuration
+
+    Returns:
+        HDXCallCounter: Counter of calls
+    """
+    counter = HDXCallCounter(configuration.call_remoteckan)
+    configuration.call_remoteckan = counter
+    return counter
+
+
+def sort_resources(dataset):
+    # Resources are shown in HDX shortest name first
+    dataset.get_resources().sort(key=lambda x: len(x["name"]))
+
+
+def publish_dataset(dataset, static_yaml, updated_by_script, batch, uploads=None):
+    """Create or update a dataset in HDX keeping the order of its resources
+
+    Args:
+        dataset (Dataset): Dataset with resources in their final order
+        static_yaml (str): Path of static dataset metadata
+        updated_by_script (str): Name of script shown in HDX
+        batch (str): Batch of this run
+        uploads (UploadManifest | None): Record of uploads. Defaults to None.
+
+    Returns:
+        None
+    """
+    dataset.update_from_yaml(static_yaml)
+    dataset.create_in_hdx(
+        remove_additional_resources=True,
+        match_resource_order=True,
+        updated_by_script=updated_by_script,
+        batch=batch,
+    )
+    if uploads:
+        uploads.update(dataset)
+
+
+def publish_showcase(showcase, datasets):
+    """Create or update a showcase in HDX and add any datasets not already in it.
+    The showcase's datasets are read once, then there is one association call
+    for each dataset that is added.
+
+    Args:
+        showcase (Showcase): Showcase
+        datasets (Sequence[Dataset]): Datasets created in HDX
+
+    Returns:
+        None
+    """
+    showcase.create_in_hdx()
+    showcase.add_datasets(datasets)
@@ -0,0 +1,204 @@
+"""
+Snapshot:
+---------
+
+Normalised rows of indicators saved as Arrow IPC files that can be memory mapped.
+Each file holds one record batch per country along with the position of each row
+in the sorted rows of the indicator. The snapshot version and the API's
+last_updated and count are stored in the schema metadata. pyarrow is an optional
+dependency.
+
+"""
+
+import json
+import logging
+from array import array
+from os import makedirs, replace
+from os.path import exists, join
+
+from hdx.scraper.idmc.gidd.columnar import EMPTY, NONE, NOT_NULL, Column, ColumnStore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+# Position of each row in the sorted rows of the indicator
+ROW_COLUMN = "_row"
+
+
+class Snapshots:
+    def __init__(self, folder):
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+
+        self.pa = pyarrow
+        self.folder = folder
+        makedirs(folder, exist_ok=True)
+
+    def get_path(self, name):
+        return join(self.folder, f"{name}.arrow")
+
+    def get_array(self, column):
+        # Nulls are read back as None or "" depending upon the null metadata.
+        # Columns of integers holding both None and "" read back as "" which is
+        # written to csv in the same way.
+        pa = self.pa
+        if column.objects is None:
+            values = [
+                None if flag else x for x, flag in zip(column.values, column.flags)
+            ]
+            null = "none" if NONE in column.flags and EMPTY not in column.flags else ""
+            return pa.array(values, type=pa.int64()), null
+        objects = column.objects
+        if column.has_tuples:
+            values = [list(x) if type(x) is tuple else None for x in objects]
+            null = "none" if None in objects and "" not in objects else ""
+            return pa.array(values, type=pa.list_(pa.string())), null
+        try:
+            values = pa.array(objects)
+            if pa.types.is_string(values.type):
+                return values, "none"
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+        # Columns of other types eg. mixing strings and numbers are kept as
+        # strings which are written to csv in the same way
+        values = [None if x is None else str(x) for x in objects]
+        return pa.array(values, type=pa.string()), "none"
+
+    def get_column(self, values, null):
+        pa = self.pa
+        nullvalue = None if null == "none" else ""
+        column = Column()
+        if pa.types.is_integer(values.type):
+            nullflag = NONE if nullvalue is None else EMPTY
+            values = values.to_pylist()
+            column.values = array("q", (0 if x is None else x for x in values))
+            column.flags = bytearray(
+                nullflag if x is None else NOT_NULL for x in values
+            )
+        else:
+            column.convert_to_objects()
+            append_object = column.append_object
+            for value in values.to_pylist():
+                append_object(nullvalue if value is None else value)
+        return column
+
+    def save(self, name, rows, last_updated, count, countrymapping):
+        """Save sorted rows of an indicator partitioned by country
+
+        Args:
+            name (str): Name of indicator
+            rows (ColumnStore): Sorted rows
+            last_updated (str): last_updated of the indicator from the API
+            count (int): Number of rows from the API
+            countrymapping (dict[str, str]): Country names from the API by ISO3
+
+        Returns:
+            str: Path of snapshot
+        """
+        pa = self.pa
+        arrays = []
+        fields = []
+        for header, column in zip(rows.headers, rows.columns):
+            values, null = self.get_array(column)
+            arrays.append(values)
+            fields.append(pa.field(header, values.type, metadata={"null": null}))
+        arrays.append(pa.array(range(len(rows)), type=pa.uint32()))
+        fields.append(pa.field(ROW_COLUMN, pa.uint32()))
+        rows_by_country = rows.get_indices_by_value("iso3")
+        countries = sorted(rows_by_country)
+        metadata = {
+            "snapshot_version": str(SNAPSHOT_VERSION),
+            "last_updated": last_updated,
+            "count": str(count),
+            "countries": json.dumps(countries),
+            "countrymapping": json.dumps(countrymapping),
+        }
+        schema = pa.schema(fields, metadata=metadata)
+        table = pa.Table.from_arrays(arrays, schema=schema)
+        path = self.get_path(name)
+        temp_path = f"{path}.tmp"
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for countryiso in countries:
+                    indices = pa.array(rows_by_country[countryiso], type=pa.uint32())
+                    for batch in table.take(indices).to_batches():
+                        writer.write_batch(batch)
+        replace(temp_path, path)
+        return path
+
+    def get_metadata(self, schema):
+        metadata = {x.decode(): y.decode() for x, y in schema.metadata.items()}
+        metadata["snapshot_version"] = int(metadata["snapshot_version"])
+        metadata["count"] = int(metadata["count"])
+        metadata["countries"] = json.loads(metadata["countries"])
+        metadata["countrymapping"] = json.loads(metadata["countrymapping"])
+        return metadata
+
+    def open(self, name):
+        pa = self.pa
+        reader = pa.ipc.open_file(pa.memory_map(self.get_path(name)))
+        return reader, self.get_metadata(reader.schema)
+
+    def get_table(self, reader, countryiso=None):
+        pa = self.pa
+        if countryiso:
+            countries = json.loads(reader.schema.metadata[b"countries"])
+            if countryiso in countries:
+                batch = reader.get_batch(countries.index(countryiso))
+                table = pa.Table.from_batches([batch])
+            else:
+                table = reader.schema.empty_table()
+        else:
+            table = reader.read_all()
+        indices = pa.compute.sort_indices(table[ROW_COLUMN])
+        return table.take(indices)
+
+    def read_table(self, name, countryiso=None):
+        """Read a snapshot as a memory mapped pyarrow Table, sorted as in the
+        indicator's csv, optionally for one country only
+
+        Args:
+            name (str): Name of indicator
+            countryiso (str | None): Country to read. Defaults to None (all).
+
+        Returns:
+            tuple[pyarrow.Table, dict]: Table and snapshot metadata
+        """
+        reader, metadata = self.open(name)
+        return self.get_table(reader, countryiso), metadata
+
+    def load(self, name, last_updated=None, count=None):
+        """Load the rows of an indicator if there is a snapshot of the current
+        version that matches last_updated and count where given
+
+        Args:
+            name (str): Name of indicator
+            last_updated (str | None): last_updated from the API. Defaults to None.
+            count (int | None): Number of rows from the API. Defaults to None.
+
+        Returns:
+            tuple[ColumnStore, dict] | None: Sorted rows and metadata or None
+        """
+        if not exists(self.get_path(name)):
+            return None
+        reader, metadata = self.open(name)
+        if metadata["snapshot_version"] != SNAPSHOT_VERSION:
+            logger.info(f"Snapshot of {name} is from a different version")
+            return None
+        if last_updated is not None and metadata["last_updated"] != last_updated:
+            return None
+        if count is not None and metadata["count"] != count:
+            return None
+        table = self.get_table(reader)
+        headers = [x for x in table.column_names if x != ROW_COLUMN]
+        rows = ColumnStore(headers)
+        rows.columns = [
+            self.get_column(
+                table[header].combine_chunks(),
+                table.schema.field(header).metadata[b"null"].decode(),
+            )
+            for header in headers
+        ]
+        rows.no_rows = table.num_rows
+        return rows, metadata
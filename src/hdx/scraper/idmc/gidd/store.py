@@ -0,0 +1,104 @@
+"""
+Row store:
+----------
+
+SQLite backed store of the normalised rows of an indicator so that they do not
+all need to be held in memory. Each thread reads through its own connection.
+
+"""
+
+import json
+import sqlite3
+from threading import Lock, local
+
+
+class RowStore:
+    def __init__(self, path, indicator):
+        self.path = path
+        # Columns used for filtering and sorting are stored alongside the whole
+        # row which is stored as JSON
+        self.columns = ["iso3", "year"]
+        for column in indicator["sort"]:
+            if column not in self.columns:
+                self.columns.append(column)
+        self.order_by = ", ".join(f'"{column}"' for column in indicator["sort"])
+        # Reads can come from several threads when country datasets are
+        # generated in parallel. A connection must not be used by more than one
+        # thread at a time so each thread gets its own. Connections can be closed
+        # from any thread.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.thread_data = local()
+        self.thread_data.connection = self.connection
+        self.connections = [self.connection]
+        self.lock = Lock()
+        columns = ", ".join(f'"{column}"' for column in self.columns)
+        self.connection.execute("DROP TABLE IF EXISTS rows")
+        self.connection.execute(f"CREATE TABLE rows ({columns}, row)")
+        self.no_rows = 0
+
+    def add_rows(self, rows):
+        columns = self.columns
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+        def get_values():
+            for row in rows:
+                self.no_rows += 1
+                yield [row[column] for column in columns] + [dumps(row)]
+
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO rows VALUES ({placeholders})", get_values()
+            )
+            self.connection.execute('CREATE INDEX iso3_index ON rows ("iso3")')
+
+    def get_connection(self):
+        connection = getattr(self.thread_data, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.thread_data.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def __len__(self):
+        return self.no_rows
+
+    def has_country(self, countryiso):
+        cursor = self.get_connection().execute(
+            'SELECT 1 FROM rows WHERE "iso3" = ? LIMIT 1', (countryiso,)
+        )
+        return cursor.fetchone() is not None
+
+    def count_country(self, countryiso):
+        cursor = self.get_connection().execute(
+            'SELECT COUNT(*) FROM rows WHERE "iso3" = ?', (countryiso,)
+        )
+        return cursor.fetchone()[0]
+
+    def get_years(self, countryiso=None):
+        if countryiso:
+            cursor = self.get_connection().execute(
+                'SELECT DISTINCT "year" FROM rows WHERE "iso3" = ?', (countryiso,)
+            )
+        else:
+            cursor = self.get_connection().execute('SELECT DISTINCT "year" FROM rows')
+        return {year for (year,) in cursor}
+
+    def get_sorted_rows(self, countryiso=None):
+        # rowid keeps rows with equal sort keys in download order as sorted does
+        order_by = f"ORDER BY {self.order_by}, rowid"
+        if countryiso:
+            cursor = self.get_connection().execute(
+                f'SELECT row FROM rows WHERE "iso3" = ? {order_by}', (countryiso,)
+            )
+        else:
+            cursor = self.get_connection().execute(f"SELECT row FROM rows {order_by}")
+        for (row,) in cursor:
+            yield json.loads(row)
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
@@ -0,0 +1,57 @@
+"""
+Uploads:
+--------
+
+Records the hash, size and url of each file uploaded to HDX so that a later run
+can leave a resource whose file is unchanged pointing at the existing upload and
+only update its metadata.
+
+"""
+
+from os.path import exists
+from threading import Lock
+
+from hdx.utilities.loader import load_json
+from hdx.utilities.saver import save_json
+
+
+class UploadManifest:
+    def __init__(self, path):
+        self.path = path
+        if exists(path):
+            self.data = load_json(path)
+        else:
+            self.data = {}
+        self.lock = Lock()
+
+    def get_upload(self, dataset_name, resource_name, filepath):
+        # Returns the recorded upload if the file has the same size and hash
+        upload = self.data.get(dataset_name, {}).get(resource_name)
+        if not upload:
+            return None
+        # Imported here as it needs openpyxl which is slow to import
+        from hdx.utilities.file_hashing import get_size_and_hash
+
+        size, hash = get_size_and_hash(filepath, "csv")
+        if upload["size"] != size or upload["hash"] != hash:
+            return None
+        return upload
+
+    def update(self, dataset):
+        # Called with a dataset that has been created in HDX whose resources
+        # hold the size and hash that HDX calculated on upload
+        uploads = {}
+        for resource in dataset.get_resources():
+            if resource.get("url_type") != "upload" or not resource.get("hash"):
+                continue
+            uploads[resource["name"]] = {
+                "hash": resource["hash"],
+                "size": resource["size"],
+                "url": resource["url"],
+            }
+        with self.lock:
+            self.data[dataset["name"]] = uploads
+
+    def save(self):
+        with self.lock:
+            save_json(self.data, self.path, pretty=True, sortkeys=True)
@@ -0,0 +1,97 @@
+"""
+URL checker:
+------------
+
+Checks whether urls exist concurrently using HEAD requests, caching the results
+on disk so that repeat runs within the time to live do not need the network.
+Urls that were not found have their own, shorter, time to live so that a page
+that was down or has just been created is soon checked again.
+
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists
+from time import time
+
+from requests import RequestException, Session
+from requests.adapters import HTTPAdapter
+
+from hdx.utilities.loader import load_json
+from hdx.utilities.saver import save_json
+
+logger = logging.getLogger(__name__)
+
+
+class URLChecker:
+    def __init__(
+        self,
+        cache_path,
+        ttl,
+        max_workers=10,
+        headers=None,
+        timeout=30,
+        missing_ttl=0,
+    ):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.max_workers = max_workers
+        self.headers = headers
+        self.timeout = timeout
+        if exists(cache_path):
+            self.cache = load_json(cache_path)
+        else:
+            self.cache = {}
+
+    def get_session(self):
+        session = Session()
+        if self.headers:
+            session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers, pool_maxsize=self.max_workers
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def url_exists(self, session, url):
+        try:
+            response = session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code in (405, 501):
+                # Server does not support HEAD
+                response = session.get(url, stream=True, timeout=self.timeout)
+                response.close()
+            return response.ok
+        except RequestException:
+            return False
+
+    def get_ttl(self, url_exists):
+        if url_exists:
+            return self.ttl
+        return self.missing_ttl
+
+    def check(self, urls):
+        now = time()
+        results = {}
+        urls_to_check = []
+        for url in urls:
+            cached = self.cache.get(url)
+            if cached and now - cached["checked"] < self.get_ttl(cached["exists"]):
+                results[url] = cached["exists"]
+            elif url not in urls_to_check:
+                urls_to_check.append(url)
+        logger.info(
+            f"{len(results)} urls found in cache. Checking {len(urls_to_check)} urls."
+        )
+        if urls_to_check:
+            with self.get_session() as session:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    exist = executor.map(
+                        lambda url: self.url_exists(session, url), urls_to_check
+                    )
+                    for url, url_exists in zip(urls_to_check, exist):
+                        results[url] = url_exists
+                        self.cache[url] = {"exists": url_exists, "checked": now}
+            save_json(self.cache, self.cache_path, pretty=True, sortkeys=True)
+        return results
@@ -0,0 +1,99 @@
+"""
+Writer:
+-------
+
+Writes the global csv and the csv of every country for an indicator in a single
+pass over its sorted rows or a single csv at a time.
+
+"""
+
+import csv
+from os.path import join
+
+
+def get_filepath(folder, basename, countryiso=None):
+    if countryiso:
+        return join(folder, f"{basename}_{countryiso}.csv")
+    return join(folder, f"{basename}.csv")
+
+
+def write_csv(filepath, headers, rows, flatten=(), buffering=1 << 16):
+    """Write rows to a csv. Rows are lists of values in header order. Columns in
+    flatten hold lists which are joined with commas.
+
+    Args:
+        filepath (str): Path of file to write
+        headers (list[str]): Headers
+        rows (Iterable[list]): Rows in the order required in the output
+        flatten (Sequence[str]): Columns to flatten. Defaults to ().
+        buffering (int): Size of write buffer. Defaults to 65536.
+
+    Returns:
+        str: Path of file
+    """
+    flatten_indices = [headers.index(header) for header in flatten]
+    with open(filepath, "w", encoding="utf-8", newline="", buffering=buffering) as file:
+        writerow = csv.writer(file, lineterminator="\n").writerow
+        writerow(headers)
+        for row in rows:
+            if flatten_indices:
+                row = list(row)
+                for index in flatten_indices:
+                    row[index] = ",".join(row[index])
+            writerow(row)
+    return filepath
+
+
+def write_csvs(folder, basename, headers, rows, flatten=(), buffering=1 << 16):
+    """Write rows to a global csv and a csv per country. Rows are lists of values
+    in header order. Columns in flatten hold lists which are joined with commas
+    in the country csvs. Values are written as Dataset.generate_resource writes
+    them so that the output is the same.
+
+    Args:
+        folder (str): Folder to which to write files
+        basename (str): Global file is basename.csv and country files basename_ISO3.csv
+        headers (list[str]): Headers which must include iso3
+        rows (Iterable[list]): Rows sorted as required in the output
+        flatten (Sequence[str]): Columns to flatten in country csvs. Defaults to ().
+        buffering (int): Size of write buffer for each file. Defaults to 65536.
+
+    Returns:
+        dict[str | None, str]: Paths of files by country with global file under None
+    """
+    iso3_index = headers.index("iso3")
+    flatten_indices = [headers.index(header) for header in flatten]
+    filepath = get_filepath(folder, basename)
+    filepaths = {None: filepath}
+    country_files = []
+    country_writers = {}
+
+    def get_country_writer(countryiso):
+        filepath = get_filepath(folder, basename, countryiso)
+        file = open(filepath, "w", encoding="utf-8", newline="", buffering=buffering)
+        country_files.append(file)
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(headers)
+        filepaths[countryiso] = filepath
+        return writer.writerow
+
+    with open(filepath, "w", encoding="utf-8", newline="", buffering=buffering) as file:
+        writerow = csv.writer(file, lineterminator="\n").writerow
+        writerow(headers)
+        try:
+            for row in rows:
+                writerow(row)
+                countryiso = row[iso3_index]
+                country_writerow = country_writers.get(countryiso)
+                if country_writerow is None:
+                    country_writerow = get_country_writer(countryiso)
+                    country_writers[countryiso] = country_writerow
+                if flatten_indices:
+                    row = list(row)
+                    for index in flatten_indices:
+                        row[index] = ",".join(row[index])
+                country_writerow(row)
+        finally:
+            for country_file in country_files:
+                country_file.close()
+    return filepaths
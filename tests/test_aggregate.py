@@ -0,0 +1,97 @@
+"""
+Unit tests for aggregates.
+
+"""
+
+from os.path import basename
+
+from hdx.scraper.idmc.gidd.aggregate import (
+    aggregate_rows,
+    aggregate_rows_python,
+    get_source_headers,
+    write_aggregates,
+)
+from hdx.utilities.path import temp_dir
+
+
+class TestAggregate:
+    columns = {
+        "iso3": ["TZA", "AFG", "AFG", "XKX", "AFG"],
+        "year": [2020, 2021, 2020, 2020, 2021],
+        "hazard": ["Flood", "Flood", "Drought", "Flood", "Flood"],
+        "new_displacement": [5, "", 7, None, ""],
+    }
+
+    def test_aggregate_rows(self):
+        headers, rows = aggregate_rows(
+            self.columns, ["iso3", "year"], ["new_displacement"], "events"
+        )
+        assert headers == ["iso3", "year", "new_displacement", "events"]
+        assert rows == [
+            ["AFG", 2020, 7, 1],
+            ["AFG", 2021, "", 2],
+            ["TZA", 2020, 5, 1],
+            ["XKX", 2020, "", 1],
+        ]
+        headers, rows = aggregate_rows(self.columns, ["hazard"])
+        assert headers == ["hazard"]
+        assert rows == [["Drought"], ["Flood"]]
+        # pyarrow, if installed, gives the same as the Python fallback
+        for group_by in (["iso3", "year"], ["year", "hazard"], ["hazard"]):
+            expected = aggregate_rows_python(
+                self.columns, group_by, ["new_displacement"], "events"
+            )
+            assert (
+                aggregate_rows(self.columns, group_by, ["new_displacement"], "events")
+                == expected
+            )
+
+    def test_write_aggregates(self, configuration):
+        aggregates = [
+            {
+                "name": "hazard",
+                "title": "By hazard",
+                "group_by": ["year", "hazard"],
+                "sum": ["new_displacement"],
+            },
+            {
+                "name": "region",
+                "title": "By region",
+                "group_by": ["region"],
+                "count": "events",
+                "countries": False,
+            },
+        ]
+        assert get_source_headers(aggregates) == [
+            "hazard",
+            "iso3",
+            "new_displacement",
+            "year",
+        ]
+        with temp_dir("test_aggregate", delete_on_failure=False) as folder:
+            columns = dict(self.columns)
+            filepaths = write_aggregates(folder, aggregates, columns)
+            assert {x: basename(y) for x, y in filepaths["hazard"].items()} == {
+                None: "By hazard.csv",
+                "AFG": "By hazard_AFG.csv",
+                "TZA": "By hazard_TZA.csv",
+                "XKX": "By hazard_XKX.csv",
+            }
+            assert {x: basename(y) for x, y in filepaths["region"].items()} == {
+                None: "By region.csv",
+            }
+            with open(filepaths["hazard"][None], encoding="utf-8") as file:
+                assert file.read() == (
+                    "year,hazard,new_displacement\n"
+                    "2020,Drought,7\n"
+                    "2020,Flood,5\n"
+                    "2021,Flood,\n"
+                )
+            with open(filepaths["hazard"]["AFG"], encoding="utf-8") as file:
+                assert file.read() == (
+                    "iso3,year,hazard,new_displacement\n"
+                    "AFG,2020,Drought,7\n"
+                    "AFG,2021,Flood,\n"
+                )
+            with open(filepaths["region"][None], encoding="utf-8") as file:
+                assert file.read() == "region,events\n,1\nAfrica,1\nAsia,3\n"
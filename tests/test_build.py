@@ -0,0 +1,108 @@
+"""
+Unit tests for build only mode.
+
+"""
+
+from os import makedirs
+from os.path import exists, join
+
+import pytest
+
+from hdx.api.locations import Locations
+from hdx.data.resource import Resource
+from hdx.data.vocabulary import Vocabulary
+from hdx.scraper.idmc.gidd.build import build, use_local_reference_data
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import Download
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import script_dir_plus_file, temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+class FakeURLChecker:
+    def check(self, urls):
+        return {url: True for url in urls}
+
+
+class TestBuild:
+    @pytest.fixture
+    def local_reference_data(self, configuration, monkeypatch):
+        monkeypatch.setattr(Locations, "_validlocations", Locations._validlocations)
+        monkeypatch.setattr(Resource, "_formats_dict", Resource._formats_dict)
+        monkeypatch.setattr(Vocabulary, "_tags_dict", Vocabulary._tags_dict)
+        monkeypatch.setattr(
+            Vocabulary, "_approved_vocabulary", Vocabulary._approved_vocabulary
+        )
+        use_local_reference_data(configuration)
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_build(
+        self, configuration, local_reference_data, fixtures, input_folder, workers
+    ):
+        static_yaml = script_dir_plus_file(
+            join("config", "hdx_dataset_static.yaml"), Pipeline
+        )
+        with temp_dir(
+            f"test_build_{workers}", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(configuration, retriever, folder)
+                summary = build(pipeline, FakeURLChecker(), static_yaml, workers)
+            assert load_json(join(folder, "build.json")) == summary
+            assert [x["name"] for x in summary["datasets"]] == [
+                "idmc-internal-displacements-new-displacements-idps",
+                "idmc-internal-displacements-new-displacements-associated-with-disasters",
+            ]
+            assert (
+                summary["showcase"]["name"]
+                == "idmc-global-report-on-internal-displacement"
+            )
+            assert len(summary["countries"]) == 212
+            assert summary["failed"] == ["AB9", "XKX"]
+
+            afg = next(x for x in summary["countries"] if x["iso3"] == "AFG")
+            dataset = afg["dataset"]
+            assert dataset["name"] == "idmc-idp-data-afg"
+            metadata = load_json(join(folder, dataset["metadata"]))
+            assert metadata["name"] == "idmc-idp-data-afg"
+            assert metadata["maintainer"]
+            assert [x["name"] for x in metadata["resources"]] == list(dataset["files"])
+            for filename in dataset["files"].values():
+                assert exists(join(folder, filename))
+            assert exists(join(folder, afg["showcase"]["metadata"]))
+            for filename in dataset["files"].values():
+                with open(join(folder, filename), encoding="utf-8") as f:
+                    with open(join(fixtures, filename), encoding="utf-8") as g:
+                        assert f.read() == g.read()
+
+    def test_scratch_folder(self, configuration, local_reference_data, input_folder):
+        static_yaml = script_dir_plus_file(
+            join("config", "hdx_dataset_static.yaml"), Pipeline
+        )
+        with temp_dir(
+            "test_build_scratch", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            output_folder = join(folder, "build")
+            scratch_folder = join(folder, "scratch")
+            makedirs(scratch_folder)
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                with Pipeline(
+                    configuration,
+                    retriever,
+                    output_folder,
+                    streaming=True,
+                    checkpoint=True,
+                    scratch_folder=scratch_folder,
+                ) as pipeline:
+                    build(pipeline, FakeURLChecker(), static_yaml)
+            # Only csvs and metadata are in the output folder
+            assert not exists(join(output_folder, "checkpoints"))
+            assert not exists(join(output_folder, "disaster.sqlite"))
+            assert exists(join(scratch_folder, "checkpoints"))
+            assert exists(join(output_folder, "build.json"))
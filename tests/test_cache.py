@@ -0,0 +1,160 @@
+"""
+Unit tests for the response cache.
+
+"""
+
+from glob import glob
+from os import makedirs, remove
+from os.path import join
+
+from hdx.scraper.idmc.gidd.cache import CachingRetriever, ResponseCache
+from hdx.scraper.idmc.gidd.client import GIDDClient
+from hdx.scraper.idmc.gidd.mockapi import MockHelixAPI, get_endpoints
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+class TestCache:
+    def download(self, configuration, folder, cache, download_workers=1, save=False):
+        with GIDDClient(retries=0, user_agent="test") as client:
+            retriever = Retrieve(client, folder, folder, folder, save, False)
+            retriever = CachingRetriever(retriever, cache)
+            pipeline = Pipeline(configuration, retriever, folder, download_workers)
+            pipeline.download_indicators()
+            return {
+                name: list(data["rows"].get_rows())
+                for name, data in pipeline.indicator_data.items()
+            }
+
+    def test_get_key(self):
+        assert ResponseCache.get_key(
+            "https://a.org/gidd/?limit=10&client_id=X&format=json"
+        ) == ResponseCache.get_key("https://a.org/gidd/?format=json&limit=10")
+
+    def test_conditional_requests(self, configuration, input_folder):
+        endpoints = get_endpoints(configuration, input_folder)
+        with temp_dir(
+            "test_cache", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            cache_folder = join(folder, "cache")
+            with MockHelixAPI(endpoints) as api:
+                mock_configuration = api.get_configuration(configuration)
+                cache = ResponseCache(cache_folder)
+                expected = self.download(mock_configuration, folder, cache)
+                requests = api.get_stats()["requests"]
+                assert cache.get_stats()["misses"] == requests
+
+                # Every page is revalidated and none has changed
+                cache = ResponseCache(cache_folder)
+                rows = self.download(mock_configuration, folder, cache, 2)
+                assert rows == expected
+                stats = api.get_stats()
+                assert stats["requests"] == 2 * requests
+                assert stats["not_modified"] == requests
+                assert cache.get_stats()["not_modified"] == requests
+
+                # Only the last page of displacement is downloaded again
+                endpoint = endpoints["/external-api/gidd/conflicts/"]
+                endpoint["rows"][-1] = dict(endpoint["rows"][-1], year=2030)
+                cache = ResponseCache(cache_folder)
+                rows = self.download(mock_configuration, folder, cache)
+                assert rows["displacement"] != expected["displacement"]
+                assert rows["disaster"] == expected["disaster"]
+                assert cache.get_stats()["misses"] == 1
+
+            # Pages that have not expired need no requests
+            cache = ResponseCache(cache_folder, ttl=3600)
+            for entry in cache.index.values():
+                entry["expires"] = 0
+            with MockHelixAPI(endpoints) as api:
+                mock_configuration = api.get_configuration(configuration)
+                self.download(mock_configuration, folder, cache)
+                assert api.get_stats()["requests"] == requests
+                rows = self.download(mock_configuration, folder, cache)
+                assert api.get_stats()["requests"] == requests
+                assert cache.get_stats()["hits"] == requests
+                assert rows["disaster"] == expected["disaster"]
+
+    def test_evict(self):
+        with temp_dir(
+            "test_cache_evict", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            cache = ResponseCache(folder, max_bytes=250)
+            json = {"results": ["x" * 50]}
+            for i in range(3):
+                cache.store(f"https://a.org/{i}", json, {"ETag": f'"{i}"'})
+            assert sorted(cache.index) == [
+                "https://a.org/0",
+                "https://a.org/1",
+                "https://a.org/2",
+            ]
+            # Using the oldest page makes the next oldest the least recently used
+            cache.load("https://a.org/0")
+            cache.store("https://a.org/3", json, {})
+            assert sorted(cache.index) == [
+                "https://a.org/0",
+                "https://a.org/2",
+                "https://a.org/3",
+            ]
+            assert cache.get_stats()["evictions"] == 1
+            assert cache.get_entry("https://a.org/1") is None
+            assert cache.load("https://a.org/1") is None
+            cache = ResponseCache(folder, max_bytes=250)
+            assert cache.get_entry("https://a.org/2")["etag"] == '"2"'
+
+    def test_evicted_while_used(self, configuration, input_folder, monkeypatch):
+        endpoints = get_endpoints(configuration, input_folder)
+        with temp_dir(
+            "test_cache_evicted", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            cache = ResponseCache(join(folder, "cache"), ttl=3600)
+            with MockHelixAPI(endpoints) as api:
+                mock_configuration = api.get_configuration(configuration)
+                expected = self.download(mock_configuration, folder, cache)
+                requests = api.get_stats()["requests"]
+
+                # Pages are evicted by another worker between being found fresh
+                # and loaded so they are downloaded again
+                def is_fresh(entry):
+                    for path in glob(join(cache.folder, "*.json")):
+                        if path != cache.index_path:
+                            remove(path)
+                    return True
+
+                monkeypatch.setattr(cache, "is_fresh", is_fresh)
+                rows = self.download(mock_configuration, folder, cache)
+                assert rows == expected
+                assert api.get_stats()["requests"] == 2 * requests
+                assert cache.get_stats()["hits"] == 0
+
+    def test_save(self, configuration, input_folder):
+        endpoints = get_endpoints(configuration, input_folder)
+        with temp_dir(
+            "test_cache_save",
+            delete_if_exists=True,
+            delete_on_success=True,
+            delete_on_failure=False,
+        ) as folder:
+            saved_folder = join(folder, "saved")
+            makedirs(saved_folder)
+            cache = ResponseCache(join(folder, "cache"), ttl=3600)
+            with MockHelixAPI(endpoints) as api:
+                mock_configuration = api.get_configuration(configuration)
+                expected = self.download(mock_configuration, folder, cache)
+                requests = api.get_stats()["requests"]
+                # Pages from a warm cache are saved too
+                self.download(mock_configuration, saved_folder, cache, save=True)
+                assert api.get_stats()["requests"] == requests
+            with Download(user_agent="test") as downloader:
+                retriever = Retrieve(
+                    downloader, folder, saved_folder, folder, False, True
+                )
+                pipeline = Pipeline(mock_configuration, retriever, folder)
+                pipeline.download_indicators()
+                rows = {
+                    name: list(data["rows"].get_rows())
+                    for name, data in pipeline.indicator_data.items()
+                }
+            assert rows == expected
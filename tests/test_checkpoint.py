@@ -0,0 +1,120 @@
+"""
+Unit tests for page checkpoints.
+
+"""
+
+from os import listdir
+from os.path import join
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from hdx.scraper.idmc.gidd.checkpoint import PageCheckpoints
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import DownloadError
+from hdx.utilities.path import temp_dir
+
+
+class Retriever:
+    # Serves count rows in pages, failing requests for offsets in fail_offsets
+    def __init__(self, count):
+        self.count = count
+        self.no_rows = count
+        self.offsets = []
+        self.fail_offsets = set()
+        self.downloader = self
+        self.session = None
+
+    def clone(self, downloader):
+        return self
+
+    def download_json(self, url, filename, **kwargs):
+        query = parse_qs(urlsplit(url).query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query["limit"][0])
+        self.offsets.append(offset)
+        if offset in self.fail_offsets:
+            raise DownloadError(f"Download of {filename} failed!")
+        results = [
+            {"iso3": "AFG", "country_name": "Afghanistan", "year": 2000 + i}
+            for i in range(offset, min(offset + limit, self.no_rows))
+        ]
+        if offset + limit < self.count:
+            next_url = (
+                f"http://stub/gidd/?format=json&limit={limit}&offset={offset + limit}"
+            )
+        else:
+            next_url = None
+        return {
+            "last_updated": "2025-05-13",
+            "count": self.count,
+            "next": next_url,
+            "results": results,
+        }
+
+
+class TestCheckpoint:
+    indicator = {
+        "name": "stub",
+        "url": "http://stub/gidd/?format=json",
+        "page_size": 2,
+        "headers": ["iso3", "country_name", "year"],
+        "sort": ["year"],
+    }
+
+    def test_page_checkpoints(self):
+        with temp_dir(
+            "test_checkpoint", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            checkpoints = PageCheckpoints(join(folder, "checkpoints"), "stub")
+            first_page = {"last_updated": "2025-05-13", "count": 3, "next": "a"}
+            assert checkpoints.start(first_page) is False
+            checkpoints.save(1, {"results": [1]})
+            assert sorted(listdir(checkpoints.folder)) == ["stub_0.json", "stub_1.json"]
+            assert checkpoints.start(dict(first_page)) is True
+            assert checkpoints.load(1) == {"results": [1]}
+            assert checkpoints.load(2) is None
+            first_page["last_updated"] = "2025-05-14"
+            assert checkpoints.start(first_page) is False
+            assert checkpoints.load(1) is None
+            assert checkpoints.load(0) == first_page
+
+    @pytest.mark.parametrize("download_workers", [1, 2])
+    def test_resume(self, configuration, download_workers):
+        with temp_dir(
+            "test_checkpoint_resume", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            retriever = Retriever(7)
+            retriever.fail_offsets = {6}
+            pipeline = Pipeline(
+                configuration,
+                retriever,
+                folder,
+                download_workers=download_workers,
+                checkpoint=True,
+            )
+            with pytest.raises(DownloadError):
+                pipeline.download_data(self.indicator)
+            assert sorted(retriever.offsets) == [0, 2, 4, 6]
+
+            retriever.offsets = []
+            retriever.fail_offsets = set()
+            data = pipeline.download_data(self.indicator)
+            assert len(data["rows"]) == 7
+            # The first page is always downloaded to check the checkpoints are
+            # for the same data
+            assert retriever.offsets == [0, 6]
+
+            retriever.offsets = []
+            data = pipeline.download_data(self.indicator)
+            assert retriever.offsets == [0]
+
+    def test_count_mismatch(self, configuration):
+        with temp_dir(
+            "test_checkpoint_count", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            retriever = Retriever(7)
+            retriever.no_rows = 6
+            pipeline = Pipeline(configuration, retriever, folder, checkpoint=True)
+            with pytest.raises(DownloadError, match="Downloaded 6 rows of stub"):
+                pipeline.download_data(self.indicator)
@@ -0,0 +1,174 @@
+"""
+Unit tests for Helix API client.
+
+"""
+
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import exists, join
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from hdx.scraper.idmc.gidd.client import GIDDClient, RateLimiter
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import DownloadError
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Failures to inject into successive requests: a status code or "drop" to
+    # close the connection without responding
+    failures = []
+    requests = []
+    count = 5
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure == "drop":
+                self.close_connection = True
+                return
+            self.send_response(failure)
+            if failure == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query["limit"][0])
+        results = [
+            {"iso3": "AFG", "country_name": "Afghanistan", "year": 2000 + i}
+            for i in range(offset, min(offset + limit, self.count))
+        ]
+        if offset + limit < self.count:
+            host, port = self.server.server_address
+            next_url = f"http://{host}:{port}/gidd/?format=json&limit={limit}&offset={offset + limit}"
+        else:
+            next_url = None
+        body = json.dumps(
+            {
+                "last_updated": "2025-05-13",
+                "count": self.count,
+                "next": next_url,
+                "previous": None,
+                "results": results,
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestClient:
+    @pytest.fixture
+    def server_url(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        thread = Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        StubHandler.failures = []
+        StubHandler.requests = []
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def client(self):
+        with GIDDClient(
+            retries=3, backoff_factor=0.01, timeout=5, user_agent="test"
+        ) as client:
+            yield client
+
+    def test_retries(self, server_url, client):
+        url = f"{server_url}/gidd/?format=json&limit=10"
+        StubHandler.failures = [503, "drop", 429]
+        json = client.download_json(url)
+        assert json["count"] == 5
+        assert len(StubHandler.requests) == 4
+        summary = client.stats.summary()
+        assert summary["requests"] == 1
+        assert summary["retries"] == 3
+        assert summary["failures"] == 0
+        assert summary["bytes"] > 0
+        assert client.stats.requests[0]["url"] == url
+
+        # Statuses that are not in retry_statuses are not retried
+        StubHandler.requests = []
+        StubHandler.failures = [404]
+        with pytest.raises(DownloadError):
+            client.download_json(url)
+        assert len(StubHandler.requests) == 1
+
+        StubHandler.requests = []
+        StubHandler.failures = [500, 502, 503, 504]
+        with pytest.raises(DownloadError):
+            client.download_json(url)
+        assert len(StubHandler.requests) == 4
+        assert client.stats.summary()["failures"] == 2
+
+        # Retries can be overridden per request
+        StubHandler.requests = []
+        StubHandler.failures = [504]
+        with pytest.raises(DownloadError):
+            client.download_json(url, retries=0)
+        assert len(StubHandler.requests) == 1
+
+    def test_clone(self, client):
+        clone = client.clone()
+        assert clone is not client
+        assert clone.session is client.session
+        assert clone.stats is client.stats
+        assert clone.rate_limiter is client.rate_limiter
+        assert clone.retries == 3
+
+    def test_rate_limiter(self, monkeypatch):
+        now = [100.0]
+        sleeps = []
+        monkeypatch.setattr("hdx.scraper.idmc.gidd.client.monotonic", lambda: now[0])
+        monkeypatch.setattr("hdx.scraper.idmc.gidd.client.sleep", sleeps.append)
+        rate_limiter = RateLimiter(4)
+        for _ in range(3):
+            rate_limiter.wait()
+        assert sleeps == [0.25, 0.5]
+        rate_limiter = RateLimiter()
+        rate_limiter.wait()
+        rate_limiter.delay(2)
+        rate_limiter.wait()
+        assert sleeps == [0.25, 0.5, 2]
+
+    def test_pipeline(self, configuration, server_url, client):
+        indicator = {
+            "name": "stub",
+            "url": f"{server_url}/gidd/?format=json",
+            "page_size": 2,
+            "headers": ["iso3", "country_name", "year"],
+            "sort": ["year"],
+        }
+        StubHandler.failures = [503, "drop"]
+        with temp_dir(
+            "test_client", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            retriever = Retrieve(client, folder, folder, folder, True, False)
+            pipeline = Pipeline(configuration, retriever, folder, download_workers=2)
+            data = pipeline.download_data(indicator)
+            assert len(data["rows"]) == 5
+            assert data["years"] == {2000, 2001, 2002, 2003, 2004}
+            assert client.stats.summary()["requests"] == 3
+            assert client.stats.summary()["retries"] == 2
+            assert exists(join(folder, "stub_2.json"))
+
+            retriever = Retrieve(client, folder, folder, folder, False, True)
+            pipeline = Pipeline(configuration, retriever, folder)
+            StubHandler.requests = []
+            data = pipeline.download_data(indicator)
+            assert len(data["rows"]) == 5
+            assert StubHandler.requests == []
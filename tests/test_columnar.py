@@ -0,0 +1,49 @@
+"""
+Unit tests for columnar.
+
+"""
+
+from hdx.scraper.idmc.gidd.columnar import ColumnStore
+
+
+class TestColumnar:
+    def test_column_store(self):
+        headers = ["iso3", "year", "new_displacement", "event_codes", "missing"]
+        rows = [
+            {"iso3": "AGO", "year": 2020, "new_displacement": 5, "event_codes": []},
+            {"iso3": "AFG", "year": 2021, "new_displacement": "", "event_codes": []},
+            {
+                "iso3": "AFG",
+                "year": 2020,
+                "new_displacement": 7,
+                "event_codes": ["FL-2020", "TC-2020"],
+            },
+            {"iso3": "AFG", "year": 2020, "new_displacement": 3, "event_codes": []},
+        ]
+        store = ColumnStore(headers)
+        store.add_rows(rows)
+        assert len(store) == 4
+        assert store.get_column("year").objects is None
+        assert store.get_column("new_displacement").objects is None
+        assert store.get_column("iso3").objects == ["AGO", "AFG", "AFG", "AFG"]
+        assert store.get_column("event_codes").objects[0] == ()
+        store.sort(["year", "iso3"])
+        assert list(store.get_rows()) == [
+            ["AFG", 2020, 7, ["FL-2020", "TC-2020"], None],
+            ["AFG", 2020, 3, [], None],
+            ["AGO", 2020, 5, [], None],
+            ["AFG", 2021, "", [], None],
+        ]
+        indices_by_value = store.get_indices_by_value("iso3")
+        assert list(indices_by_value["AFG"]) == [0, 1, 3]
+        assert list(indices_by_value["AGO"]) == [2]
+        rows = store.get_rows(indices_by_value["AFG"])
+        assert list(rows) == [
+            ["AFG", 2020, 7, ["FL-2020", "TC-2020"], None],
+            ["AFG", 2020, 3, [], None],
+            ["AFG", 2021, "", [], None],
+        ]
+
+        store = ColumnStore(["value"])
+        store.add_rows([{"value": 1}, {"value": ""}, {"value": "text"}])
+        assert store.get_column("value").objects == [1, "", "text"]
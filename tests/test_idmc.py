@@ -4,11 +4,19 @@ Unit tests for IDMC GIDD.
 
 """
 
-from os.path import join
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from os import environ, pathsep
+from os.path import basename, join
+from subprocess import run
 
+from hdx.scraper.idmc.gidd.client import GIDDClient
+from hdx.scraper.idmc.gidd.manifest import Manifest
 from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.scraper.idmc.gidd.uploads import UploadManifest
 from hdx.utilities.compare import assert_files_same
-from hdx.utilities.downloader import Download
+from hdx.utilities.downloader import Download, DownloadError
+from hdx.utilities.file_hashing import get_size_and_hash
 from hdx.utilities.path import temp_dir
 from hdx.utilities.retriever import Retrieve
 
@@ -80,7 +88,7 @@ class TestIDMC:
                     downloader, folder, input_folder, folder, False, True
                 )
                 # indicator dataset test
-                pipeline = Pipeline(configuration, retriever, folder)
+                pipeline = Pipeline(configuration, retriever, folder, aggregates=True)
                 indicators = pipeline.get_indicators()
                 assert len(indicators) == 2
                 pipeline.download_indicators()
@@ -96,6 +104,10 @@ class TestIDMC:
                 countries = pipeline.get_countryiso3s()
                 assert len(countries) == 212
                 assert countries[1] == {"iso3": "AFG"}
+                queue = pipeline.get_country_queue()
+                assert len(queue) == 212
+                assert queue == sorted(queue, key=lambda x: (-x["rows"], x["iso3"]))
+                assert sum(x["rows"] for x in queue) == 961 + 22119
                 datasets, showcase = pipeline.generate_indicator_datasets_and_showcase()
                 compare(
                     datasets["displacement"],
@@ -165,7 +177,22 @@ class TestIDMC:
                             "name": "Internal displacements (new displacements) associated with disasters",
                             "description": "Internal displacements (new displacements) associated with disasters",
                             "format": "csv",
-                        }
+                        },
+                        {
+                            "name": "Internal displacements associated with disasters by country and year",
+                            "description": "Internal displacements associated with disasters by country and year",
+                            "format": "csv",
+                        },
+                        {
+                            "name": "Internal displacements associated with disasters by hazard type and year",
+                            "description": "Internal displacements associated with disasters by hazard type and year",
+                            "format": "csv",
+                        },
+                        {
+                            "name": "Internal displacements associated with disasters by region and year",
+                            "description": "Internal displacements associated with disasters by region and year",
+                            "format": "csv",
+                        },
                     ],
                 )
                 assert showcase == {
@@ -242,6 +269,16 @@ class TestIDMC:
                             "description": "Internal displacements (new displacements) associated with disasters for Afghanistan",
                             "format": "csv",
                         },
+                        {
+                            "name": "Internal displacements associated with disasters by country and year",
+                            "description": "Internal displacements associated with disasters by country and year for Afghanistan",
+                            "format": "csv",
+                        },
+                        {
+                            "name": "Internal displacements associated with disasters by hazard type and year",
+                            "description": "Internal displacements associated with disasters by hazard type and year for Afghanistan",
+                            "format": "csv",
+                        },
                     ],
                     suffix="_AFG",
                 )
@@ -270,3 +307,261 @@ class TestIDMC:
                         },
                     ],
                 }
+
+    def test_download_concurrently(self, configuration, input_folder):
+        next_url = "https://helix-tools-api.idmcdb.org/external-api/gidd/conflicts/?client_id=ABC&format=json&limit=100&offset=100"
+        urls = Pipeline.get_offset_urls(next_url, 961)
+        assert len(urls) == 9
+        assert (
+            urls[0]
+            == "https://helix-tools-api.idmcdb.org/external-api/gidd/conflicts/?format=json&limit=100&offset=100"
+        )
+        assert (
+            urls[-1]
+            == "https://helix-tools-api.idmcdb.org/external-api/gidd/conflicts/?format=json&limit=100&offset=900"
+        )
+
+        with temp_dir(
+            "test_idmc_concurrent", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(configuration, retriever, folder)
+                pipeline.download_indicators()
+                concurrent_pipeline = Pipeline(
+                    configuration, retriever, folder, download_workers=4
+                )
+                concurrent_pipeline.download_indicators()
+                for key, data in pipeline.indicator_data.items():
+                    concurrent_data = concurrent_pipeline.indicator_data[key]
+                    assert list(concurrent_data["rows"].get_rows()) == list(
+                        data["rows"].get_rows()
+                    )
+                    assert concurrent_data["rows_by_country"] == data["rows_by_country"]
+                assert concurrent_pipeline.countries == pipeline.countries
+                data = pipeline.indicator_data["displacement"]
+                assert data["years_by_country"]["AFG"] == set(range(2009, 2025))
+                assert data["years"] == set(range(2009, 2025))
+                indices = data["rows_by_country"]["AFG"]
+                assert next(data["rows"].get_rows(indices)) == [
+                    "AFG",
+                    "Afghanistan",
+                    2009,
+                    0,
+                    "",
+                    297000,
+                    297000,
+                ]
+
+    def test_adaptive_page_size(self, configuration):
+        class Retriever:
+            def __init__(self, downloader):
+                self.downloader = downloader
+                self.page_sizes = []
+
+            def download_json(self, url, filename, timeout, retries=None):
+                assert filename == "disaster_0.json"
+                assert timeout == 60
+                page_size = Pipeline.get_page_size(url)
+                # Only the smallest page size is retried
+                assert (retries is None) == (page_size == 100)
+                self.page_sizes.append(page_size)
+                if page_size > 1000:
+                    raise DownloadError(f"Timed out with {page_size}!")
+                return {"count": 0, "next": None, "results": []}
+
+        with GIDDClient(user_agent="test") as client:
+            retriever = Retriever(client)
+            pipeline = Pipeline(configuration, retriever, "")
+            indicator = {**pipeline.get_indicators()[1], "page_size": "adaptive"}
+            assert pipeline.get_page_sizes(indicator) == [10000, 5000, 1000, 100]
+            data = pipeline.download_data(indicator)
+        assert len(data["rows"]) == 0
+        assert retriever.page_sizes == [10000, 5000, 1000]
+        assert pipeline.get_page_sizes(pipeline.get_indicators()[0]) == [100]
+
+    def test_streaming(self, configuration, fixtures, input_folder):
+        def compare_files(dataset, suffix=""):
+            for resource in dataset.get_resources():
+                filename = f"{resource['name']}{suffix}.csv"
+                assert_files_same(
+                    join(fixtures, filename), resource.get_file_to_upload()
+                )
+
+        with temp_dir(
+            "test_idmc_streaming", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(configuration, retriever, folder, streaming=True)
+                pipeline.download_indicators()
+                store = pipeline.indicator_data["disaster"]["store"]
+                # Each thread reads through its own connection
+                with ThreadPoolExecutor(4) as executor:
+                    counts = executor.map(
+                        lambda x: sum(1 for _ in store.get_sorted_rows(x)),
+                        ["AFG", "PHL", "CHN", "USA"] * 4,
+                    )
+                    counts = list(counts)
+                assert counts[:4] * 4 == counts
+                assert counts[0] == store.count_country("AFG")
+                assert len(pipeline.indicator_data["displacement"]["store"]) == 961
+                assert len(pipeline.indicator_data["disaster"]["store"]) == 22119
+                assert len(pipeline.get_countryiso3s()) == 212
+                assert pipeline.get_country_rows("AFG") == sum(
+                    sum(1 for _ in x["store"].get_sorted_rows("AFG"))
+                    for x in pipeline.indicator_data.values()
+                )
+                datasets, _ = pipeline.generate_indicator_datasets_and_showcase()
+                compare_files(datasets["displacement"])
+                compare_files(datasets["disaster"])
+                dataset, _ = pipeline.generate_country_dataset_and_showcase("AFG")
+                assert (
+                    dataset["dataset_date"]
+                    == "[2008-01-01T00:00:00 TO 2024-12-31T23:59:59]"
+                )
+                compare_files(dataset, suffix="_AFG")
+                pipeline.close()
+                assert store.connections == []
+
+    def test_incremental(self, configuration, input_folder):
+        with temp_dir(
+            "test_idmc_incremental",
+            delete_if_exists=True,
+            delete_on_success=True,
+            delete_on_failure=False,
+        ) as folder:
+            manifest_path = join(folder, "manifest.json")
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                manifest = Manifest(manifest_path)
+                pipeline = Pipeline(configuration, retriever, folder, manifest=manifest)
+                pipeline.download_indicators()
+                assert len(pipeline.get_updated_indicators()) == 2
+                assert len(pipeline.get_countryiso3s()) == 212
+                manifest.save()
+
+                manifest = Manifest(manifest_path)
+                assert manifest.data["disaster"]["last_updated"] == "2025-05-13"
+                assert manifest.data["disaster"]["count"] == 22119
+                assert len(manifest.data["displacement"]["hashes"]) == 88
+                pipeline = Pipeline(configuration, retriever, folder, manifest=manifest)
+                pipeline.download_indicators()
+                assert pipeline.get_updated_indicators() == []
+                assert pipeline.get_countryiso3s() == []
+                assert pipeline.indicator_data == {}
+
+                manifest.data["disaster"]["last_updated"] = "2025-01-01"
+                manifest.data["disaster"]["hashes"]["AFG"] = "changed"
+                pipeline = Pipeline(configuration, retriever, folder, manifest=manifest)
+                pipeline.download_indicators()
+                indicators = pipeline.get_updated_indicators()
+                assert [x["name"] for x in indicators] == ["disaster"]
+                assert pipeline.get_countryiso3s() == [{"iso3": "AFG"}]
+                # AFG has displacement data so that is needed too
+                assert len(pipeline.indicator_data["displacement"]["rows"]) == 961
+                assert manifest.data["disaster"]["last_updated"] == "2025-05-13"
+                # The showcase keeps the tags of the indicators not updated
+                datasets, showcase = pipeline.generate_indicator_datasets_and_showcase()
+                assert list(datasets) == ["disaster"]
+                assert "conflict-violence" in showcase.get_tags()
+
+    def test_skip_unchanged_uploads(self, configuration, input_folder):
+        def mark_uploaded(dataset):
+            # What HDX sets on the resources of a created dataset
+            for resource in dataset.get_resources():
+                filepath = resource.get_file_to_upload()
+                resource["size"], resource["hash"] = get_size_and_hash(filepath, "csv")
+                resource["url"] = f"https://data.humdata.org/{basename(filepath)}"
+                resource["url_type"] = "upload"
+
+        with temp_dir(
+            "test_idmc_uploads",
+            delete_if_exists=True,
+            delete_on_success=True,
+            delete_on_failure=False,
+        ) as folder:
+            uploads_path = join(folder, "upload_manifest.json")
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                uploads = UploadManifest(uploads_path)
+                pipeline = Pipeline(configuration, retriever, folder, uploads=uploads)
+                pipeline.download_indicators()
+                dataset, _ = pipeline.generate_country_dataset_and_showcase("AFG")
+                assert pipeline.has_uploads(dataset) is True
+                mark_uploaded(dataset)
+                uploads.update(dataset)
+                uploads.save()
+
+                uploads = UploadManifest(uploads_path)
+                name = "Internal displacements (new displacements) associated with disasters"
+                upload = uploads.data["idmc-idp-data-afg"][name]
+                assert upload["url"] == f"https://data.humdata.org/{name}_AFG.csv"
+                pipeline = Pipeline(configuration, retriever, folder, uploads=uploads)
+                pipeline.download_indicators()
+                dataset, _ = pipeline.generate_country_dataset_and_showcase("AFG")
+                assert pipeline.has_uploads(dataset) is False
+                resource = dataset.get_resource(1)
+                assert resource["url"] == upload["url"]
+                assert resource["hash"] == upload["hash"]
+                assert resource["url_type"] == "upload"
+
+                upload["hash"] = "changed"
+                dataset, _ = pipeline.generate_country_dataset_and_showcase("AFG")
+                assert pipeline.has_uploads(dataset) is True
+                resources = dataset.get_resources()
+                assert resources[0].get_file_to_upload() is None
+                assert resources[1].get_file_to_upload().endswith("disasters_AFG.csv")
+
+    def test_generation_order(self, configuration, fixtures, input_folder):
+        def compare_files(dataset, suffix=""):
+            for resource in dataset.get_resources():
+                filename = f"{resource['name']}{suffix}.csv"
+                assert_files_same(
+                    join(fixtures, filename), resource.get_file_to_upload()
+                )
+
+        with temp_dir(
+            "test_idmc_order", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(configuration, retriever, folder)
+                pipeline.download_indicators()
+                # Generating a country more than once or before the global
+                # datasets must not change the rows
+                for _ in range(2):
+                    dataset, _ = pipeline.generate_country_dataset_and_showcase("AFG")
+                    compare_files(dataset, suffix="_AFG")
+                data = pipeline.indicator_data["disaster"]
+                indices = data["rows_by_country"]["AFG"]
+                assert next(data["rows"].get_rows(indices))[-1] == []
+                datasets, _ = pipeline.generate_indicator_datasets_and_showcase()
+                compare_files(datasets["disaster"])
+
+    def test_lazy_imports(self):
+        # Modules only needed to generate datasets are imported when first used
+        code = (
+            "import sys; import hdx.scraper.idmc.gidd.pipeline; "
+            "print(sorted(x for x in sys.modules if x.startswith("
+            "('hdx.data', 'hdx.location'))))"
+        )
+        env = dict(environ, PYTHONPATH=pathsep.join(sys.path))
+        result = run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            check=True,
+            env=env,
+            text=True,
+        )
+        assert result.stdout.strip() == "[]"
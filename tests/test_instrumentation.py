@@ -0,0 +1,97 @@
+"""
+Unit tests for instrumentation.
+
+"""
+
+import pstats
+from os.path import exists, join
+
+import pytest
+
+from hdx.scraper.idmc.gidd.instrumentation import Instrumentation, profile
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+class TestInstrumentation:
+    def test_instrumentation(self):
+        instrumentation = Instrumentation()
+        with instrumentation.span("generate_country", "AFG"):
+            pass
+        with instrumentation.span("generate_country", "AGO"):
+            pass
+        with pytest.raises(ValueError):
+            with instrumentation.span("upload_country", "AFG"):
+                raise ValueError("Upload failed")
+        values = list(instrumentation.timed_iter("pages", iter([1, 2, 3])))
+        assert values == [1, 2, 3]
+        instrumentation.count("rows", 5)
+        instrumentation.count("rows")
+        report = instrumentation.get_report()
+        span = report["spans"]["generate_country"]
+        assert span["count"] == 2
+        assert sorted(span["items"]) == ["AFG", "AGO"]
+        assert span["total"] == pytest.approx(sum(span["items"].values()))
+        assert report["spans"]["upload_country"]["count"] == 1
+        assert report["spans"]["pages"]["count"] == 1
+        assert "items" not in report["spans"]["pages"]
+        assert report["counters"] == {"rows": 6}
+        item_times = instrumentation.get_item_times(
+            "generate_country", "upload_country"
+        )
+        assert sorted(item_times["AFG"]) == ["generate_country", "upload_country"]
+        assert list(item_times["AGO"]) == ["generate_country"]
+        assert report["peak_memory_mb"] > 0
+        assert report["wall_time"] > 0
+
+    def test_no_peak_memory(self, monkeypatch):
+        # Peak memory is not known where resource is not available eg. Windows
+        monkeypatch.setattr("hdx.scraper.idmc.gidd.instrumentation.getrusage", None)
+        assert Instrumentation().get_report()["peak_memory_mb"] is None
+
+    def test_pipeline(self, configuration, input_folder):
+        with temp_dir(
+            "test_instrumentation", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(configuration, retriever, folder)
+                pipeline.download_indicators()
+                pipeline.generate_country_dataset_and_showcase("AFG")
+                report = pipeline.instrumentation.get_report()
+                assert report["counters"] == {
+                    "pages": 232,
+                    "requests": 232,
+                    "rows": 23080,
+                }
+                spans = report["spans"]
+                for name in ("download", "download_pages", "sort", "write_csvs"):
+                    assert sorted(spans[name]["items"]) == ["disaster", "displacement"]
+
+    def test_profile(self, monkeypatch):
+        with temp_dir(
+            "test_profile", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            output = join(folder, "profile.prof")
+            monkeypatch.setenv("GIDD_PROFILE", "cprofile")
+            monkeypatch.setenv("GIDD_PROFILE_OUTPUT", output)
+            with profile() as profiler:
+                assert profiler is not None
+                sorted(range(1000))
+            stats = pstats.Stats(output)
+            assert stats.total_calls > 0
+
+            monkeypatch.setenv("GIDD_PROFILE", "unknown")
+            output = join(folder, "unknown.prof")
+            monkeypatch.setenv("GIDD_PROFILE_OUTPUT", output)
+            with profile() as profiler:
+                assert profiler is None
+            assert not exists(output)
+
+            monkeypatch.delenv("GIDD_PROFILE")
+            with profile() as profiler:
+                assert profiler is None
@@ -0,0 +1,147 @@
+"""
+Unit tests for the mock Helix API.
+
+"""
+
+import pytest
+
+from hdx.scraper.idmc.gidd.client import GIDDClient
+from hdx.scraper.idmc.gidd.mockapi import (
+    MockHelixAPI,
+    RepeatedRows,
+    get_endpoints,
+    load_saved_rows,
+)
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+class TestMockAPI:
+    @pytest.fixture
+    def endpoints(self, configuration, input_folder):
+        return get_endpoints(configuration, input_folder)
+
+    @staticmethod
+    def get_adaptive_configuration(api, configuration):
+        # Disasters are downloaded with the adaptive page size
+        mock_configuration = api.get_configuration(configuration)
+        mock_configuration["indicators"][1]["page_size"] = "adaptive"
+        return mock_configuration
+
+    def download(self, configuration, folder, downloader, download_workers=1):
+        retriever = Retrieve(downloader, folder, folder, folder, False, False)
+        pipeline = Pipeline(configuration, retriever, folder, download_workers)
+        pipeline.download_indicators()
+        return {
+            name: list(data["rows"].get_rows())
+            for name, data in pipeline.indicator_data.items()
+        }
+
+    def test_repeated_rows(self):
+        rows = RepeatedRows(["a", "b", "c"], 7)
+        assert len(rows) == 7
+        assert rows[2:5] == ["c", "a", "b"]
+        assert rows[5:10] == ["c", "a"]
+
+    def test_pages(self, configuration, input_folder, endpoints):
+        rows, last_updated = load_saved_rows(input_folder, "displacement")
+        assert len(rows) == 961
+        assert last_updated == "2025-05-13"
+        with MockHelixAPI(endpoints) as api:
+            url = api.get_url(configuration["indicators"][0]["url"])
+            assert url.startswith(api.base_url)
+            with Download(user_agent="test") as downloader:
+                json = downloader.download_json(f"{url}&client_id=X&limit=400")
+                assert json["count"] == 961
+                assert json["results"] == rows[:400]
+                assert json["previous"] is None
+                assert json["next"] == (
+                    f"{api.base_url}/external-api/gidd/conflicts/"
+                    "?client_id=X&format=json&limit=400&offset=400"
+                )
+                json = downloader.download_json(
+                    f"{url}&client_id=X&limit=400&offset=800"
+                )
+                assert json["results"] == rows[800:]
+                assert json["next"] is None
+                assert json["previous"].endswith("&limit=400&offset=400")
+            assert api.get_stats()["requests"] == 2
+
+    def test_download(self, configuration, input_folder, endpoints):
+        with temp_dir(
+            "test_mockapi", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download(user_agent="test") as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(configuration, retriever, folder)
+                pipeline.download_indicators()
+                expected = {
+                    name: list(data["rows"].get_rows())
+                    for name, data in pipeline.indicator_data.items()
+                }
+            with MockHelixAPI(endpoints, latency=0.01) as api:
+                mock_configuration = api.get_configuration(configuration)
+                assert configuration["indicators"][0]["url"].startswith("https://")
+                with Download(user_agent="test") as downloader:
+                    rows = self.download(mock_configuration, folder, downloader)
+                    assert rows == expected
+                    rows = self.download(mock_configuration, folder, downloader, 4)
+                    assert rows == expected
+                assert api.get_stats()["max_concurrent"] > 1
+
+    def test_errors(self, configuration, endpoints):
+        with temp_dir(
+            "test_mockapi_errors", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with MockHelixAPI(endpoints, error_rate=0.3, max_limit=5000, seed=1) as api:
+                mock_configuration = self.get_adaptive_configuration(api, configuration)
+                with GIDDClient(
+                    retries=10, backoff_factor=0.001, user_agent="test"
+                ) as client:
+                    # Retrying gets every row despite the failures and the first
+                    # page size of disasters being too large
+                    rows = self.download(mock_configuration, folder, client, 3)
+                    assert len(rows["displacement"]) == 961
+                    assert len(rows["disaster"]) == 22119
+                stats = api.get_stats()
+                summary = client.stats.summary()
+                assert stats["errors"] > 0
+                assert summary["retries"] > 0
+                assert summary["failures"] == 1
+
+    def test_page_size_probe(self, configuration, endpoints):
+        with temp_dir(
+            "test_mockapi_probe", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with MockHelixAPI(endpoints, max_limit=1000) as api:
+                mock_configuration = self.get_adaptive_configuration(api, configuration)
+                # The retry settings of project_configuration.yaml
+                with GIDDClient(
+                    **configuration["api_client"], user_agent="test"
+                ) as client:
+                    rows = self.download(mock_configuration, folder, client)
+                    assert len(rows["disaster"]) == 22119
+                stats = api.get_stats()
+                summary = client.stats.summary()
+                # One request for each of the page sizes 10000 and 5000 of
+                # disasters that are too large
+                assert stats["errors"] == 2
+                assert summary["failures"] == 2
+                assert summary["retries"] == 0
+                assert stats["requests"] == summary["requests"] + 2
+
+    def test_size(self, configuration, input_folder):
+        endpoints = get_endpoints(configuration, input_folder, size=30000)
+        with temp_dir(
+            "test_mockapi_size", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with MockHelixAPI(endpoints) as api:
+                mock_configuration = api.get_configuration(configuration)
+                with Download(user_agent="test") as downloader:
+                    rows = self.download(mock_configuration, folder, downloader, 2)
+                assert len(rows["displacement"]) == 30000
+                assert len(rows["disaster"]) == 30000
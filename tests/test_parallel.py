@@ -0,0 +1,91 @@
+"""
+Unit tests for parallel.
+
+"""
+
+from threading import Event
+
+from hdx.scraper.idmc.gidd.parallel import (
+    get_remaining,
+    progress_storing_pool,
+    resumable_order,
+)
+from hdx.utilities.loader import load_text
+from hdx.utilities.path import progress_storing_folder, temp_dir_batch
+
+
+class TestParallel:
+    def test_progress_storing_pool(self, monkeypatch):
+        monkeypatch.delenv("WHERETOSTART", raising=False)
+        countries = [{"iso3": iso3} for iso3 in ("AFG", "AGO", "ALB", "DZA")]
+        agoevent = Event()
+        processed = []
+
+        def function(nextdict):
+            countryiso = nextdict["iso3"]
+            if countryiso == "AGO":
+                # Finish after later countries to check that progress is not
+                # moved past an unfinished country
+                agoevent.wait(5)
+                raise ValueError("AGO is broken!")
+            processed.append(countryiso)
+            if countryiso == "DZA":
+                agoevent.set()
+
+        with temp_dir_batch("test_parallel", delete_on_success=True) as info:
+            failures = progress_storing_pool(info, countries, "iso3", function, 2)
+            assert sorted(processed) == ["AFG", "ALB", "DZA"]
+            assert list(failures) == ["AGO"]
+            assert str(failures["AGO"]) == "AGO is broken!"
+            progress_file = info["folder"] / "progress.txt"
+            assert load_text(progress_file, strip=True) == "iso3=AGO"
+
+            processed.clear()
+            agoevent.set()
+            failures = progress_storing_pool(info, countries, "iso3", function, 2)
+            assert sorted(processed) == ["ALB", "DZA"]
+            assert list(failures) == ["AGO"]
+
+    def test_resumable_order(self, monkeypatch):
+        monkeypatch.delenv("WHERETOSTART", raising=False)
+        countries = [{"iso3": "PHL", "rows": 9}, {"iso3": "AFG", "rows": 5}]
+        with temp_dir_batch("test_parallel_order", delete_on_success=True) as info:
+            countries = resumable_order(info, countries, "iso3")
+            assert [x["iso3"] for x in countries] == ["PHL", "AFG"]
+            for _, nextdict in progress_storing_folder(info, countries, "iso3"):
+                if nextdict["iso3"] == "AFG":
+                    break
+
+            # The resumed run has more rows for AFG and a new country, so its
+            # order by size would start with AFG and skip PHL
+            countries = [
+                {"iso3": "AFG", "rows": 12},
+                {"iso3": "TUV", "rows": 10},
+                {"iso3": "PHL", "rows": 9},
+            ]
+            countries = resumable_order(info, countries, "iso3")
+            assert [x["iso3"] for x in countries] == ["PHL", "AFG", "TUV"]
+            processed = [
+                x["iso3"] for _, x in progress_storing_folder(info, countries, "iso3")
+            ]
+            assert processed == ["AFG", "TUV"]
+
+    def test_get_remaining(self, monkeypatch):
+        monkeypatch.delenv("WHERETOSTART", raising=False)
+        countries = [{"iso3": iso3} for iso3 in ("AFG", "AGO", "ALB", "DZA")]
+        with temp_dir_batch("test_parallel_remaining", delete_on_success=True) as info:
+            assert get_remaining(info, countries, "iso3") == countries
+            for _, nextdict in progress_storing_folder(info, countries, "iso3"):
+                if nextdict["iso3"] == "ALB":
+                    break
+            remaining = get_remaining(info, countries, "iso3")
+            assert remaining == countries[2:]
+            processed = [x for _, x in progress_storing_folder(info, countries, "iso3")]
+            assert processed == remaining
+
+            monkeypatch.setenv("WHERETOSTART", "iso3=AGO")
+            assert get_remaining(info, countries, "iso3") == countries[1:]
+            monkeypatch.setenv("WHERETOSTART", "name=AGO")
+            assert get_remaining(info, countries, "iso3") == []
+            monkeypatch.setenv("WHERETOSTART", "RESET")
+            assert get_remaining(info, countries, "iso3") == countries
@@ -0,0 +1,92 @@
+"""
+Unit tests for generating country datasets in processes.
+
+"""
+
+from os.path import join
+
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.scraper.idmc.gidd.processes import SharedRows, generate_country_datasets
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+def read_bytes(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class TestProcesses:
+    def test_shared_rows(self):
+        rows_by_country = {
+            "AFG": [["AFG", 2020, "", None, ["FL-1", "FL-2"]]],
+            "AGO": [],
+            "TZA": [["TZA", 2021, "Flood", 5, []], ["TZA", 2022, "Drought", 7, []]],
+        }
+        with temp_dir("test_shared_rows", delete_on_failure=False) as folder:
+            shared_rows = SharedRows.write(
+                join(folder, "rows"), rows_by_country.items()
+            )
+            for countryiso in ("TZA", "AGO", "AFG"):
+                rows = shared_rows.get_rows(countryiso)
+                assert rows == rows_by_country[countryiso]
+
+    def test_generate_country_datasets(self, configuration, fixtures, input_folder):
+        countryiso3s = ["AFG", "TZA", "XKX"]
+        results = {}
+        for processes in (1, 2):
+            with temp_dir(
+                f"test_processes_{processes}",
+                delete_on_success=True,
+                delete_on_failure=False,
+            ) as folder:
+                with Download() as downloader:
+                    retriever = Retrieve(
+                        downloader, folder, input_folder, folder, False, True
+                    )
+                    pipeline = Pipeline(configuration, retriever, folder)
+                    pipeline.download_indicators()
+                    pipeline.showcase_urls = {
+                        pipeline.get_showcase_url("AFG"): True,
+                        pipeline.get_showcase_url("TZA"): False,
+                    }
+                    generated = generate_country_datasets(
+                        pipeline, countryiso3s, processes, chunksize=1
+                    )
+                    assert list(generated) == countryiso3s
+                    assert generated["XKX"] == (None, None)
+                    assert generated["TZA"][1] is None
+                    dataset, showcase = generated["AFG"]
+                    assert showcase["name"] == "idmc-idp-data-afg-showcase"
+                    resources = dataset.get_resources()
+                    for resource in resources:
+                        filename = f"{resource['name']}_AFG.csv"
+                        filepath = resource.get_file_to_upload()
+                        assert filepath == join(folder, filename)
+                        assert read_bytes(filepath) == read_bytes(
+                            join(fixtures, filename)
+                        )
+                    results[processes] = (
+                        dataset.get_dataset_dict(),
+                        [x.get_file_to_upload() for x in resources],
+                    )
+                    # Country csvs written by workers are not written again
+                    report = pipeline.instrumentation.get_report()
+                    spans = report["spans"]
+                    assert sorted(spans["generate_country"]["items"]) == sorted(
+                        countryiso3s
+                    )
+                    assert pipeline.shared_rows == {}
+                    for indicator in pipeline.get_indicators():
+                        filepaths = pipeline.get_filepaths(indicator)
+                        assert filepaths["AFG"] == join(
+                            folder, f"{indicator['title']}_AFG.csv"
+                        )
+                        if processes == 2:
+                            assert "AGO" not in filepaths
+                    if processes == 2:
+                        assert spans["share_rows"]["count"] == 1
+        dataset, files = results[2]
+        assert dataset == results[1][0]
+        assert [x.replace("_2", "_1") for x in files] == results[1][1]
@@ -0,0 +1,202 @@
+"""
+Unit tests for publishing to HDX.
+
+"""
+
+import json
+from copy import deepcopy
+from os.path import join
+from uuid import uuid4
+
+import pytest
+from ckanapi.errors import NotFound
+
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.scraper.idmc.gidd.publish import (
+    count_hdx_calls,
+    publish_dataset,
+    publish_showcase,
+    sort_resources,
+)
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import script_dir_plus_file, temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+class RecordingCKAN:
+    """Fake HDX that keeps datasets and showcases in memory and records the
+    action of every call made to it"""
+
+    def __init__(self):
+        self.calls = []
+        self.datasets = {}
+        self.showcases = {}
+        self.associations = []
+
+    def call_action(self, action, data_dict=None, files=None, **kwargs):
+        self.calls.append(action)
+        return getattr(self, action)(data_dict or {}, files)
+
+    @staticmethod
+    def new_id():
+        return str(uuid4())
+
+    def find(self, objects, data):
+        for hdxobject in objects.values():
+            if data.get("id") in (hdxobject["id"], hdxobject["name"]):
+                return hdxobject
+        raise NotFound()
+
+    def add_resource_ids(self, dataset):
+        for resource in dataset.get("resources", []):
+            resource.setdefault("id", self.new_id())
+            resource["package_id"] = dataset["id"]
+
+    def package_show(self, data, files):
+        return deepcopy(self.find(self.datasets, data))
+
+    def package_create(self, data, files):
+        dataset = deepcopy(data)
+        dataset["id"] = self.new_id()
+        self.add_resource_ids(dataset)
+        self.datasets[dataset["id"]] = dataset
+        return deepcopy(dataset)
+
+    def package_revise(self, data, files):
+        dataset = self.find(self.datasets, json.loads(data["match"]))
+        update = json.loads(data.get("update", "{}"))
+        # Resources are merged into the resources they update, by id or index
+        existing = dataset.get("resources", [])
+        resources = {x["id"]: x for x in existing}
+        for i, resource in enumerate(update.get("resources", [])):
+            original = resources.get(resource.get("id"))
+            if original is None and i < len(existing):
+                original = existing[i]
+            if original is not None:
+                update["resources"][i] = {**original, **resource}
+        dataset.update(update)
+        self.add_resource_ids(dataset)
+        for key in files or {}:
+            # Keys are of the form update__resources__0__upload
+            index = int(key.split("__")[2])
+            dataset["resources"][index]["url_type"] = "upload"
+        return {"package": deepcopy(dataset)}
+
+    def package_resource_reorder(self, data, files):
+        dataset = self.find(self.datasets, data)
+        resources = {x["id"]: x for x in dataset["resources"]}
+        dataset["resources"] = [resources[x] for x in data["order"]]
+        return {"id": dataset["id"], "order": data["order"]}
+
+    def package_create_default_resource_views(self, data, files):
+        return {}
+
+    def ckanext_showcase_show(self, data, files):
+        return deepcopy(self.find(self.showcases, data))
+
+    def ckanext_showcase_create(self, data, files):
+        showcase = deepcopy(data)
+        showcase["id"] = self.new_id()
+        self.showcases[showcase["id"]] = showcase
+        return deepcopy(showcase)
+
+    def ckanext_showcase_update(self, data, files):
+        showcase = self.find(self.showcases, data)
+        showcase.update(data)
+        return deepcopy(showcase)
+
+    def ckanext_showcase_package_list(self, data, files):
+        return [
+            deepcopy(self.datasets[package_id])
+            for package_id, showcase_id in self.associations
+            if showcase_id == data["showcase_id"]
+        ]
+
+    def ckanext_showcase_package_association_create(self, data, files):
+        self.associations.append((data["package_id"], data["showcase_id"]))
+        return data
+
+
+class TestPublish:
+    batch = "6a4a3ab8-8f1f-4d6b-9b1f-8d5f3a7e2c10"
+
+    @pytest.fixture
+    def hdx(self, configuration, monkeypatch):
+        # The fake is the remote CKAN that the counted calls are made to
+        ckan = RecordingCKAN()
+        monkeypatch.setattr(configuration, "remoteckan", lambda: ckan)
+        yield ckan, count_hdx_calls(configuration)
+        # The configuration is shared by all tests
+        del configuration.call_remoteckan
+
+    @pytest.fixture
+    def static_yaml(self):
+        return script_dir_plus_file(join("config", "hdx_dataset_static.yaml"), Pipeline)
+
+    def test_publish(self, configuration, input_folder, hdx, static_yaml):
+        ckan, counter = hdx
+        batch = self.batch
+        with temp_dir(
+            "test_publish", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(configuration, retriever, folder)
+                pipeline.download_indicators()
+                pipeline.showcase_urls = {pipeline.get_showcase_url("AFG"): True}
+                dataset, _ = pipeline.generate_country_dataset_and_showcase("AFG")
+                sort_resources(dataset)
+                names = [x["name"] for x in dataset.get_resources()]
+                assert names == sorted(names, key=len)
+
+                # Resources are created in order so no reorder is needed
+                publish_dataset(dataset, static_yaml, "test", batch)
+                assert ckan.calls == [
+                    "package_show",
+                    "package_create",
+                    "package_revise",
+                ]
+                stored = next(iter(ckan.datasets.values()))
+                assert [x["name"] for x in stored["resources"]] == names
+                assert all(x["url_type"] == "upload" for x in stored["resources"])
+
+                # Updating a dataset already in order does not reorder it
+                ckan.calls = []
+                dataset, _ = pipeline.generate_country_dataset_and_showcase("AFG")
+                sort_resources(dataset)
+                publish_dataset(dataset, static_yaml, "test", batch)
+                assert "package_resource_reorder" not in ckan.calls
+                assert ckan.calls[:2] == ["package_show", "package_revise"]
+
+                # Updating a dataset out of order in HDX reorders it once
+                stored["resources"].reverse()
+                ckan.calls = []
+                dataset, _ = pipeline.generate_country_dataset_and_showcase("AFG")
+                sort_resources(dataset)
+                publish_dataset(dataset, static_yaml, "test", batch)
+                assert ckan.calls.count("package_resource_reorder") == 1
+                assert [x["name"] for x in stored["resources"]] == names
+
+                # The showcase's datasets are read once and each missing dataset
+                # is added with its own call
+                datasets, showcase = pipeline.generate_indicator_datasets_and_showcase()
+                for dataset in datasets.values():
+                    publish_dataset(dataset, static_yaml, "test", batch)
+                ckan.calls = []
+                publish_showcase(showcase, list(datasets.values()))
+                assert ckan.calls.count("ckanext_showcase_package_list") == 1
+                assert ckan.calls.count(
+                    "ckanext_showcase_package_association_create"
+                ) == len(datasets)
+                # Datasets already in the showcase are not added again
+                ckan.calls = []
+                publish_showcase(showcase, list(datasets.values()))
+                assert "ckanext_showcase_package_association_create" not in ckan.calls
+                assert len(ckan.associations) == len(datasets)
+
+        summary = counter.summary()
+        assert summary["calls"] == sum(summary["actions"].values())
+        assert summary["actions"]["package_create"] == 1 + len(datasets)
+        assert summary["actions"]["ckanext_showcase_package_list"] == 2
@@ -0,0 +1,116 @@
+"""
+Unit tests for snapshots.
+
+"""
+
+from os.path import join
+
+import pytest
+
+from hdx.scraper.idmc.gidd.columnar import ColumnStore
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+pytest.importorskip("pyarrow")
+
+from hdx.scraper.idmc.gidd.snapshot import Snapshots  # noqa: E402
+
+
+class FailingRetriever:
+    """Retriever that only allows first pages to be read"""
+
+    def __init__(self, retriever):
+        self.retriever = retriever
+        self.downloader = retriever.downloader
+        self.filenames = []
+
+    def download_json(self, url, filename, **kwargs):
+        self.filenames.append(filename)
+        if not filename.endswith("_0.json"):
+            raise AssertionError(f"{filename} should not be needed!")
+        return self.retriever.download_json(url, filename=filename, **kwargs)
+
+
+class TestSnapshot:
+    def test_save_load(self):
+        headers = ["iso3", "year", "value", "name", "event_codes"]
+        rows = ColumnStore(headers)
+        rows.add_rows(
+            [
+                {
+                    "iso3": "AFG",
+                    "year": 2020,
+                    "value": "",
+                    "name": "A",
+                    "event_codes": ["FL-1"],
+                },
+                {
+                    "iso3": "TZA",
+                    "year": 2021,
+                    "value": 5,
+                    "name": "",
+                    "event_codes": [],
+                },
+                {
+                    "iso3": "AFG",
+                    "year": 2022,
+                    "value": 7,
+                    "name": None,
+                    "event_codes": ["DR-1", "DR-2"],
+                },
+            ]
+        )
+        with temp_dir("test_snapshot", delete_on_failure=False) as folder:
+            snapshots = Snapshots(folder)
+            mapping = {"AFG": "Afghanistan", "TZA": "Tanzania"}
+            snapshots.save("test", rows, "2025-05-13", 3, mapping)
+            assert snapshots.load("test", "2025-05-14", 3) is None
+            assert snapshots.load("test", "2025-05-13", 4) is None
+            assert snapshots.load("other") is None
+            loaded, metadata = snapshots.load("test", "2025-05-13", 3)
+            assert list(loaded.get_rows()) == list(rows.get_rows())
+            assert loaded.get_column("year").objects is None
+            assert metadata["countries"] == ["AFG", "TZA"]
+            assert metadata["countrymapping"] == mapping
+            table, _ = snapshots.read_table("test", "AFG")
+            assert table["year"].to_pylist() == [2020, 2022]
+            table, _ = snapshots.read_table("test", "AGO")
+            assert table.num_rows == 0
+
+    def test_pipeline(self, configuration, input_folder):
+        with temp_dir(
+            "test_snapshot_pipeline", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                snapshots = Snapshots(join(folder, "snapshots"))
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(
+                    configuration, retriever, folder, snapshots=snapshots
+                )
+                pipeline.download_indicators()
+                expected = pipeline.indicator_data
+                countrymapping = pipeline.countrymapping
+
+                # Only the first pages are needed when the snapshots are current
+                retriever = FailingRetriever(retriever)
+                csv_folder = join(folder, "csvs")
+                pipeline = Pipeline(
+                    configuration, retriever, csv_folder, snapshots=snapshots
+                )
+                pipeline.download_indicators()
+                assert retriever.filenames == ["displacement_0.json", "disaster_0.json"]
+                assert pipeline.first_pages == {}
+                assert pipeline.countrymapping == countrymapping
+                assert pipeline.countries == set(countrymapping)
+                for indicator in pipeline.get_indicators():
+                    name = indicator["name"]
+                    data = pipeline.indicator_data[name]
+                    assert list(data["rows"].get_rows()) == list(
+                        expected[name]["rows"].get_rows()
+                    )
+                    for key in ("rows_by_country", "years", "years_by_country"):
+                        assert data[key] == expected[name][key]
@@ -0,0 +1,83 @@
+"""
+Unit tests for URL checker.
+
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+from threading import Thread
+
+import pytest
+
+from hdx.scraper.idmc.gidd.urlchecker import URLChecker
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import temp_dir
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def respond(self):
+        self.requests.append((self.command, self.path))
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+        elif self.path.startswith("/nohead") and self.command == "HEAD":
+            self.send_response(405)
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_HEAD = respond
+    do_GET = respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestURLChecker:
+    @pytest.fixture
+    def server_url(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        thread = Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+    def test_check(self, server_url):
+        urls = [
+            f"{server_url}/countries/Afghanistan/",
+            f"{server_url}/missing/",
+            f"{server_url}/nohead/",
+        ]
+        with temp_dir(
+            "test_urlchecker", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            cache_path = join(folder, "showcase_urls.json")
+            StubHandler.requests = []
+            urlchecker = URLChecker(cache_path, 3600, max_workers=3)
+            expected = {urls[0]: True, urls[1]: False, urls[2]: True}
+            assert urlchecker.check(urls) == expected
+            assert sorted(StubHandler.requests) == [
+                ("GET", "/nohead/"),
+                ("HEAD", "/countries/Afghanistan/"),
+                ("HEAD", "/missing/"),
+                ("HEAD", "/nohead/"),
+            ]
+            assert load_json(cache_path)[urls[1]]["exists"] is False
+
+            StubHandler.requests = []
+            urlchecker = URLChecker(cache_path, 3600, missing_ttl=3600)
+            assert urlchecker.check(urls) == expected
+            assert StubHandler.requests == []
+
+            # Urls that were not found are checked again by default
+            urlchecker = URLChecker(cache_path, 3600)
+            assert urlchecker.check(urls) == expected
+            assert StubHandler.requests == [("HEAD", "/missing/")]
+
+            StubHandler.requests = []
+            urlchecker = URLChecker(cache_path, 0)
+            assert urlchecker.check(urls[:1]) == {urls[0]: True}
+            assert StubHandler.requests == [("HEAD", "/countries/Afghanistan/")]
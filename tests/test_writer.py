@@ -0,0 +1,78 @@
+"""
+Unit tests for writer.
+
+"""
+
+from os.path import basename, join
+
+from hdx.scraper.idmc.gidd.pipeline import Pipeline
+from hdx.scraper.idmc.gidd.writer import write_csv, write_csvs
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+
+def read_bytes(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class TestWriter:
+    def test_write_csvs(self):
+        headers = ["iso3", "year", "event_name", "value", "event_codes"]
+        rows = [
+            ["AFG", 2020, 'Flood "A", north', None, ["FL-1", "FL-2"]],
+            ["AGO", 2020, "Drought", 5, []],
+            ["AFG", 2021, "", 7, ["DR-1"]],
+        ]
+        with temp_dir("test_writer", delete_on_failure=False) as folder:
+            filepaths = write_csvs(folder, "data", headers, rows, ("event_codes",))
+            assert {k: basename(v) for k, v in filepaths.items()} == {
+                None: "data.csv",
+                "AFG": "data_AFG.csv",
+                "AGO": "data_AGO.csv",
+            }
+            assert read_bytes(filepaths[None]) == (
+                b"iso3,year,event_name,value,event_codes\n"
+                b'AFG,2020,"Flood ""A"", north",,"[\'FL-1\', \'FL-2\']"\n'
+                b"AGO,2020,Drought,5,[]\n"
+                b"AFG,2021,,7,['DR-1']\n"
+            )
+            assert read_bytes(filepaths["AFG"]) == (
+                b"iso3,year,event_name,value,event_codes\n"
+                b'AFG,2020,"Flood ""A"", north",,"FL-1,FL-2"\n'
+                b"AFG,2021,,7,DR-1\n"
+            )
+            assert read_bytes(filepaths["AGO"]) == (
+                b"iso3,year,event_name,value,event_codes\nAGO,2020,Drought,5,\n"
+            )
+            # The rows passed in are not changed by flattening
+            assert rows[0][-1] == ["FL-1", "FL-2"]
+            # A single country csv is written in the same way
+            filepath = write_csv(
+                join(folder, "afg.csv"),
+                headers,
+                [rows[0], rows[2]],
+                ("event_codes",),
+            )
+            assert read_bytes(filepath) == read_bytes(filepaths["AFG"])
+
+    def test_fixtures_identical(self, configuration, fixtures, input_folder):
+        with temp_dir(
+            "test_writer_fixtures", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                pipeline = Pipeline(configuration, retriever, folder)
+                pipeline.download_indicators()
+                for indicator in pipeline.get_indicators():
+                    filepaths = pipeline.get_filepaths(indicator)
+                    data = pipeline.indicator_data[indicator["name"]]
+                    assert len(filepaths) == len(data["rows_by_country"]) + 1
+                    for countryiso, suffix in ((None, ""), ("AFG", "_AFG")):
+                        filename = f"{indicator['title']}{suffix}.csv"
+                        assert read_bytes(filepaths[countryiso]) == read_bytes(
+                            join(fixtures, filename)
+                        )